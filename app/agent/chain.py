@@ -1,16 +1,20 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import initialize_agent, AgentType
-from .tools import search_offers_tool, price_offer_tool, create_order_tool
+from .tools import search_offers_tool, search_matrix_tool, price_offer_tool, create_order_tool
+from .llm import build_chat_model
 
 def build_agent():
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    tools = [search_offers_tool, price_offer_tool, create_order_tool]
+    llm = build_chat_model()
+    tools = [search_offers_tool, search_matrix_tool, price_offer_tool, create_order_tool]
     system = (
         "You are a flight assistant. When the user asks to find flights, "
         "CALL the tool `search_offers` with these fields when known: "
         "originLocationCode, destinationLocationCode, departureDate, returnDate, "
         "adults, travelClass, nonStop, currencyCode, max. "
-        "Infer IATA codes from city names when unambiguous (Amman→AMM, Doha→DOH). "
+        "For flexible dates (a date range) or several origins/destinations, CALL "
+        "`search_matrix` once instead of calling `search_offers` repeatedly. "
+        "Pass cities or airports as the user wrote them (e.g. Amman, Heathrow, DOH); "
+        "the tools resolve them to IATA codes. If a tool returns UNKNOWN_LOCATION, "
+        "ask which of its candidates the user means. "
         "If required fields are missing, ask ONE clarifying question; do NOT call "
         "the tool with empty or partial arguments."
     )
@@ -2,8 +2,8 @@ import os
 from app.config import settings
 from pydantic import BaseModel, Field
 from typing import Literal
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from .llm import build_chat_model
 
 os.environ.setdefault("OPENAI_API_KEY", settings.OPENAI_API_KEY)
 
@@ -26,5 +26,5 @@ INTENT_PROMPT = ChatPromptTemplate.from_messages([
     ("human", "{user_input}")
 ])
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+llm = build_chat_model()
 classifier = INTENT_PROMPT | llm.with_structured_output(IntentResult)
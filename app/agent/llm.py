@@ -0,0 +1,12 @@
+from langchain_openai import ChatOpenAI
+from app.config import settings
+from app.metrics import llm_metrics
+from .llm_cache import llm_cache
+
+def build_chat_model(**kwargs) -> ChatOpenAI:
+    """The chat model shared by the intent classifier and the tool agent."""
+    kwargs.setdefault("model", "gpt-4o-mini")
+    kwargs.setdefault("temperature", 0)
+    kwargs.setdefault("cache", llm_cache if settings.LLM_CACHE_ENABLED else False)
+    kwargs.setdefault("callbacks", [llm_metrics])
+    return ChatOpenAI(**kwargs)
@@ -0,0 +1,221 @@
+import asyncio, hashlib, logging, re, sqlite3, threading, time
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+import orjson
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from redis.exceptions import RedisError
+from app.config import settings
+from app.services.cache import LocalTTLCache
+from app.services.redis_client import get_redis, mark_down
+
+log = logging.getLogger(__name__)
+
+# Set per request (X-LLM-Cache: bypass) to force fresh model calls while debugging.
+cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+_WS = re.compile(r"\s+")
+
+def _normalize(obj: Any) -> Any:
+    if isinstance(obj, str):
+        return _WS.sub(" ", obj).strip()
+    if isinstance(obj, list):
+        return [_normalize(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: _normalize(v) for k, v in obj.items()}
+    return obj
+
+def _key(prompt: str, llm_string: str) -> str:
+    # Chat prompts arrive as serialized messages: normalize whitespace inside every string.
+    # llm_string carries the model, temperature and any bound tools/functions schema.
+    try:
+        norm = orjson.dumps(_normalize(orjson.loads(prompt)), option=orjson.OPT_SORT_KEYS).decode()
+    except orjson.JSONDecodeError:
+        norm = _WS.sub(" ", prompt).strip()
+    return "llm:v1:" + hashlib.sha256(f"{llm_string}\x00{norm}".encode()).hexdigest()
+
+def _dump(gens: Sequence[Generation], latency: float) -> bytes:
+    items = []
+    for g in gens:
+        if isinstance(g, ChatGeneration):
+            items.append({"message": message_to_dict(g.message), "info": g.generation_info})
+        else:
+            items.append({"text": g.text, "info": g.generation_info})
+    return orjson.dumps({"gens": items, "latency": latency}, default=str)
+
+def _load(raw: bytes) -> tuple[list[Generation], float]:
+    doc = orjson.loads(raw)
+    gens: list[Generation] = []
+    for item in doc["gens"]:
+        if "message" in item:
+            gens.append(ChatGeneration(message=messages_from_dict([item["message"]])[0], generation_info=item["info"]))
+        else:
+            gens.append(Generation(text=item["text"], generation_info=item["info"]))
+    return gens, doc.get("latency", 0.0)
+
+class _SQLiteStore:
+    """Tiny persistent tier for single-host deployments without Redis."""
+
+    def __init__(self, path: str, max_rows: int):
+        self._max_rows = max_rows
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires ON llm_cache (expires)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._db.execute("DELETE FROM llm_cache WHERE expires <= ?", (time.time(),))
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                    (self._max_rows,),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+
+class LLMResponseCache(BaseCache):
+    """In-memory LRU in front of an optional Redis or SQLite tier.
+
+    Plugged into ChatOpenAI via `cache=`; keyed on model/params/tools + prompt.
+    Also counts the calls and model latency it saved.
+    """
+
+    def __init__(self, backend: str, ttl: float, max_entries: int, sqlite_path: str = ""):
+        self.backend = backend
+        self.ttl = ttl
+        self._memory = LocalTTLCache(max_entries)
+        self._sqlite = _SQLiteStore(sqlite_path, max_entries * 10) if backend == "sqlite" else None
+        # miss start times, so an update() can record how long the real call took; concurrent
+        # identical misses share the first one's start and only the first update stores an entry
+        self._pending = LocalTTLCache(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_seconds = 0.0
+
+    # -- tiers ---------------------------------------------------------------
+    def _hit(self, key: str, raw: bytes) -> list[Generation]:
+        gens, latency = _load(raw)
+        self._memory.set(key, raw, self.ttl)
+        self.hits += 1
+        self.saved_seconds += latency
+        return gens
+
+    def _miss(self, key: str) -> None:
+        self.misses += 1
+        if self._pending.get(key) is None:
+            self._pending.set(key, time.perf_counter(), self.ttl)
+
+    def _entry(self, key: str, return_val: RETURN_VAL_TYPE) -> Optional[bytes]:
+        """The entry to store, or None when a concurrent identical miss already stored one."""
+        started = self._pending.pop(key)
+        if started is None and self._memory.get(key) is not None:
+            return None
+        return _dump(return_val, time.perf_counter() - started if started else 0.0)
+
+    def _skip(self) -> bool:
+        if cache_bypass.get():
+            self.bypassed += 1
+            return True
+        return False
+
+    # -- sync (memory + sqlite) ----------------------------------------------
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if self._skip():
+            return None
+        key = _key(prompt, llm_string)
+        raw = self._memory.get(key)
+        if raw is None and self._sqlite is not None:
+            raw = self._sqlite.get(key)
+        if raw is None:
+            self._miss(key)
+            return None
+        return self._hit(key, raw)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = _key(prompt, llm_string)
+        raw = self._entry(key, return_val)
+        if raw is None:
+            return
+        self._memory.set(key, raw, self.ttl)
+        if self._sqlite is not None:
+            self._sqlite.set(key, raw, self.ttl)
+
+    def clear(self, **kwargs: Any) -> None:
+        self._memory = LocalTTLCache(self._memory.maxsize)
+        if self._sqlite is not None:
+            self._sqlite.clear()
+
+    # -- async (memory + redis/sqlite; sqlite runs in a thread) -------------
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if self._skip():
+            return None
+        key = _key(prompt, llm_string)
+        raw = self._memory.get(key)
+        if raw is None and self._sqlite is not None:
+            raw = await asyncio.to_thread(self._sqlite.get, key)
+        r = get_redis() if raw is None and self.backend == "redis" else None
+        if r is not None:
+            try:
+                raw = await r.get(key)
+            except RedisError as e:
+                mark_down(e)
+        if raw is None:
+            self._miss(key)
+            return None
+        return self._hit(key, raw)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = _key(prompt, llm_string)
+        raw = self._entry(key, return_val)
+        if raw is None:
+            return
+        self._memory.set(key, raw, self.ttl)
+        if self._sqlite is not None:
+            # the commit (and every 100th write's prune) stays off the event loop
+            await asyncio.to_thread(self._sqlite.set, key, raw, self.ttl)
+        r = get_redis() if self.backend == "redis" else None
+        if r is not None:
+            try:
+                await r.set(key, raw, ex=int(self.ttl))
+            except RedisError as e:
+                mark_down(e)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await asyncio.to_thread(self.clear)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "savedCalls": self.hits,
+            "savedSeconds": round(self.saved_seconds, 3),
+            "memoryEntries": len(self._memory),
+        }
+
+llm_cache = LLMResponseCache(
+    backend=settings.LLM_CACHE_BACKEND,
+    ttl=settings.LLM_CACHE_TTL,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    sqlite_path=settings.LLM_CACHE_SQLITE_PATH,
+)
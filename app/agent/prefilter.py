@@ -0,0 +1,101 @@
+import re
+from collections import Counter
+from typing import Optional
+from app.config import settings
+from app.services.airports import airports
+from .intents import IntentResult, IntentType
+
+# Deterministic fast path in front of the LLM classifier. Each rule only fires on
+# unambiguous phrasing; anything else returns None and goes to `classifier`.
+
+_GREETING = re.compile(
+    r"^\s*(hi+|hello|hey|hiya|yo|salam|marhaba|good (morning|afternoon|evening)|"
+    r"thanks?( you)?( so much)?|thank u|thx|ok(ay)?|cool|great|bye|goodbye)"
+    r"(\s+(there|again|a lot))?\s*[!.?😊🙂👍]*\s*$",
+    re.I,
+)
+_HELP = re.compile(r"^\s*(help|what can you do|how does this work|what do you do)\s*[?!.]*\s*$", re.I)
+
+_KEYWORD_RULES: list[tuple[str, IntentType, re.Pattern]] = [
+    ("cancel", "CANCEL_RESERVATION", re.compile(r"\bcancel\s+(my\s+|the\s+|this\s+)?(reservation|booking|order)\b", re.I)),
+    ("list_trips", "LIST_TRIPS", re.compile(r"\b(show|list|see|view)\s+(me\s+)?(all\s+)?(my|saved|my saved)\s+trips?\b", re.I)),
+    ("save_trip", "SAVE_TRIP", re.compile(r"\bsave\s+(it|this|that|(this|that|the|my)\s+(trip|flight|offer|one))\b", re.I)),
+    ("price", "PRICE_VERIFY", re.compile(r"\b(verify|confirm|re-?check)\s+(the\s+)?(price|pricing|fare)\b", re.I)),
+    ("book", "CREATE_ORDER", re.compile(r"\b(book|reserve|purchase|buy)\s+(it|this|that|(this|that|the)\s+(flight|offer|one|ticket|cheapest))\b", re.I)),
+]
+
+# Route detection stays case-sensitive: "AMM to DOH" is a route, "get to the" is not.
+_ROUTE = re.compile(r"\b([A-Z]{3})\s*(?:→|->|-|to)\s*([A-Z]{3})\b")
+# "Amman to Doha", "New York → Heathrow": up to three capitalized words a side, resolved
+# locally (exact city/airport names only, no typo guessing).
+_NAMED_ROUTE = re.compile(r"((?:[A-Z][\w'.-]*\s+){0,2}[A-Z][\w'.-]*)\s*(?:→|->|\bto)\s+((?:[A-Z][\w'.-]*\s+){0,2}[A-Z][\w'.-]*)")
+_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_SEARCH_VERB = re.compile(r"\b(search|find|look(ing)? for|show|any|cheapest|flights?|fly|flying)\b", re.I)
+
+_hits: Counter = Counter()
+
+def _code(names: list[str]) -> Optional[str]:
+    for name in names:
+        if len(name) >= 3:
+            place = airports.resolve(name, codes=False, fuzzy=False)
+            if place is not None:
+                return place["code"]
+    return None
+
+def _named_route(text: str) -> Optional[tuple[str, str]]:
+    for m in _NAMED_ROUTE.finditer(text):
+        before, after = m.group(1).split(), m.group(2).split()
+        # "Flights Amman" -> try "Flights Amman", then "Amman"; "Doha Tomorrow" -> "Doha Tomorrow", "Doha"
+        origin = _code([" ".join(before[i:]) for i in range(len(before))])
+        destination = origin and _code([" ".join(after[:i]) for i in range(len(after), 0, -1)])
+        if destination:
+            return origin, destination
+    return None
+
+def extract_search(text: str) -> Optional[dict]:
+    """Pull origin/destination IATA codes (or city/airport names, resolved) and dates out of a search-like message."""
+    m = _ROUTE.search(text)
+    route = (m.group(1), m.group(2)) if m else _named_route(text)
+    if not route:
+        return None
+    dates = _DATE.findall(text)
+    return {
+        "originLocationCode": route[0],
+        "destinationLocationCode": route[1],
+        "departureDate": dates[0] if dates else None,
+        "returnDate": dates[1] if len(dates) > 1 else None,
+    }
+
+def _match(text: str) -> Optional[tuple[str, IntentType, float]]:
+    if _GREETING.match(text):
+        return "small_talk", "SMALL_TALK", 0.95
+    if _HELP.match(text):
+        return "help", "HELP", 0.95
+    for name, intent, pattern in _KEYWORD_RULES:
+        if pattern.search(text):
+            return name, intent, 0.9
+    slots = extract_search(text)
+    if slots and (slots["departureDate"] or _SEARCH_VERB.search(text)):
+        return "search", "FLIGHT_SEARCH", 0.95
+    return None
+
+def preclassify(text) -> Optional[IntentResult]:
+    """Return an IntentResult when a local rule is confident enough, else None (use the LLM)."""
+    if not settings.AGENT_PREFILTER_ENABLED or not isinstance(text, str) or len(text) > 300:
+        _hits["llm"] += 1
+        return None
+    hit = _match(text)
+    if hit is None or hit[2] < settings.AGENT_PREFILTER_MIN_CONFIDENCE:
+        _hits["llm"] += 1
+        return None
+    name, intent, confidence = hit
+    _hits[name] += 1
+    return IntentResult(intent=intent, confidence=confidence)
+
+def prefilter_stats() -> dict:
+    total = sum(_hits.values())
+    return {
+        "total": total,
+        "paths": dict(_hits),
+        "fastPathRate": round(1 - _hits["llm"] / total, 4) if total else 0.0,
+    }
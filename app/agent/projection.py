@@ -0,0 +1,125 @@
+from contextvars import ContextVar
+from typing import Optional
+import orjson
+from app.config import settings
+
+# What the agent LLM sees from a tool call. Full search results carry every offer's
+# raw Amadeus payload; the model only needs a few cheap, comparable offers and a short
+# "searchId:offerId" reference it can pass back to price_offer/create_order.
+# Full offers stay server-side in the offer store.
+
+# Approximate tokens spent on tool results in the current agent turn (see router).
+turn_tokens: ContextVar[Optional[list]] = ContextVar("turn_tokens", default=None)
+
+_stats = {"calls": 0, "tokens": 0, "turns": 0, "turnTokens": 0, "maxTurnTokens": 0}
+# the unprojected size is only a stat, and measuring it dumps the largest payload:
+# every FULL_SAMPLE_EVERY-th call is measured and the total extrapolated
+FULL_SAMPLE_EVERY = 20
+_full = {"samples": 0, "tokens": 0}
+
+def approx_tokens(obj) -> int:
+    # ~4 characters per token for JSON-ish English; avoids a tokenizer download on the hot path
+    return len(orjson.dumps(obj)) // 4 + 1
+
+def _leg(leg: Optional[dict]) -> Optional[str]:
+    if not leg:
+        return None
+    segs = leg.get("segments") or []
+    flights = ",".join(f"{s.get('carrierCode')}{s.get('flightNumber')}" for s in segs)
+    path = "-".join([segs[0]["from"].get("iata")] + [s["to"].get("iata") for s in segs]) if segs else "?"
+    return f"{path} {leg.get('depart')}→{leg.get('arrive')} {leg.get('duration')} stops={leg.get('stops')} {flights}"
+
+def _compact_offer(o: dict, search_id: Optional[str]) -> dict:
+    price = o.get("price") or {}
+    return {
+        "offerId": f"{search_id}:{o.get('id')}",
+        "price": f"{price.get('amount')} {price.get('currency')}",
+        "out": _leg(o.get("outbound")),
+        "ret": _leg(o.get("inbound")),
+        "airlines": o.get("validatingAirlines"),
+    }
+
+def project_search(result: dict) -> dict:
+    offers = sorted(result.get("offers", []), key=lambda o: float((o.get("price") or {}).get("amount") or 0))
+    total = len(offers)
+    search_id = (result.get("meta") or {}).get("searchId")
+    compact = [_compact_offer(o, search_id) for o in offers[:settings.AGENT_TOOL_MAX_OFFERS]]
+    out = {"offers": compact, "shown": len(compact), "found": total}
+    # trim from the expensive end until the result fits the token budget
+    while len(out["offers"]) > 1 and approx_tokens(out) > settings.AGENT_TOOL_TOKEN_BUDGET:
+        out["offers"].pop()
+        out["shown"] = len(out["offers"])
+    return out
+
+def project_matrix(result: dict) -> dict:
+    cells = result.get("cells", [])
+    out = {
+        "cheapest": [
+            {
+                "route": f'{c["origin"]}-{c["destination"]}',
+                "depart": c["departureDate"],
+                "return": c["returnDate"],
+                **_compact_offer(c["cheapest"], c["searchId"]),
+            }
+            for c in cells[:settings.AGENT_TOOL_MAX_OFFERS]
+        ],
+        "matrix": result.get("matrix"),
+        "searches": (result.get("meta") or {}).get("searches"),
+        "failed": [f'{c["origin"]}-{c["destination"]} {c["departureDate"]}: {c["error"]}' for c in result.get("errors", [])],
+    }
+    # the full route x date grid goes first when over budget, then the priciest cells
+    if approx_tokens(out) > settings.AGENT_TOOL_TOKEN_BUDGET:
+        out.pop("matrix")
+    while len(out["cheapest"]) > 1 and approx_tokens(out) > settings.AGENT_TOOL_TOKEN_BUDGET:
+        out["cheapest"].pop()
+    return out
+
+def project_price(result: dict) -> dict:
+    offers = (result.get("pricedOffer") or {}).get("flightOffers") or []
+    return {
+        "priced": [
+            {
+                "offerId": f"{result.get('searchId')}:{o.get('id')}",
+                "total": (o.get("price") or {}).get("grandTotal") or (o.get("price") or {}).get("total"),
+                "currency": (o.get("price") or {}).get("currency"),
+                "lastTicketingDate": o.get("lastTicketingDate"),
+            }
+            for o in offers
+        ]
+    }
+
+def project_order(result: dict) -> dict:
+    return {k: result.get(k) for k in ("reservationId", "status", "pnr", "replayed")}
+
+def project(result: dict, fn) -> dict:
+    """Apply `fn` to a successful tool result and record its token cost."""
+    if "error" in result:
+        compact = {k: v for k, v in result.items() if k != "body"}
+    else:
+        compact = fn(result)
+    tokens = approx_tokens(compact)
+    _stats["calls"] += 1
+    _stats["tokens"] += tokens
+    if _stats["calls"] % FULL_SAMPLE_EVERY == 1:
+        _full["samples"] += 1
+        _full["tokens"] += approx_tokens(result)
+    acc = turn_tokens.get()
+    if acc is not None:
+        acc.append(tokens)
+    return compact
+
+def record_turn(tokens: list):
+    total = sum(tokens)
+    _stats["turns"] += 1
+    _stats["turnTokens"] += total
+    _stats["maxTurnTokens"] = max(_stats["maxTurnTokens"], total)
+
+def projection_stats() -> dict:
+    turns = _stats["turns"]
+    samples = _full["samples"]
+    return {
+        **_stats,
+        "fullTokens": round(_full["tokens"] / samples * _stats["calls"]) if samples else 0,
+        "avgTokensPerTurn": round(_stats["turnTokens"] / turns, 1) if turns else 0.0,
+        "budget": settings.AGENT_TOOL_TOKEN_BUDGET,
+    }
@@ -1,4 +1,4 @@
-from langchain_core.runnables import RunnableLambda
+from .runnables import inline_lambda
 
 def _oos_text(state: dict) -> dict:
     return {
@@ -12,5 +12,5 @@ def _small_talk_text(state: dict) -> dict:
         "context": state.get("context", {}),
     }
 
-OutOfScopeResponder = RunnableLambda(_oos_text)
-SmallTalkResponder = RunnableLambda(_small_talk_text)
+OutOfScopeResponder = inline_lambda(_oos_text)
+SmallTalkResponder = inline_lambda(_small_talk_text)
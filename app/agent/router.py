@@ -1,16 +1,40 @@
-from typing import Dict
+import time
+from typing import AsyncIterator, Dict, Iterator
 from langchain_core.runnables import RunnableLambda, RunnableBranch
+from langchain_core.runnables.utils import AddableDict
 from .intents import classifier, IntentResult
 from .policy import apply_policy
+from .prefilter import preclassify
+from .projection import turn_tokens, record_turn
 from .responders import OutOfScopeResponder, SmallTalkResponder
+from .runnables import inline_lambda, StreamingLambda
+from app.metrics import observe, span
 from .chain import build_agent
 
+# Every step has an async twin so LangServe's ainvoke/abatch/astream keep the whole
+# pipeline on the event loop instead of pinning a threadpool thread per LLM round trip.
+
+# The local pre-classifier answers confident cases in microseconds; only ambiguous
+# input pays for the LLM classifier. Both feed the same apply_policy threshold.
 def _classify(payload: Dict) -> Dict:
-    ir: IntentResult = classifier.invoke({"user_input": payload["input"]})
+    with span("classify", "prefilter"):
+        ir: IntentResult | None = preclassify(payload["input"])
+    if ir is None:
+        with span("classify", "llm"):
+            ir = classifier.invoke({"user_input": payload["input"]})
     ctx = apply_policy(ir)
     # keep input + policy context
     return {"input": payload["input"], "context": ctx}
 
+async def _aclassify(payload: Dict) -> Dict:
+    with span("classify", "prefilter"):
+        ir: IntentResult | None = preclassify(payload["input"])
+    if ir is None:
+        with span("classify", "llm"):
+            ir = await classifier.ainvoke({"user_input": payload["input"]})
+    ctx = apply_policy(ir)
+    return {"input": payload["input"], "context": ctx}
+
 def _is_out_of_scope(x: Dict) -> bool:
     return x.get("context", {}).get("outOfScope") is True
 
@@ -19,21 +43,21 @@ def _is_small_talk(x: Dict) -> bool:
 
 # --- wrap the agent so it's a Runnable ---
 ToolAgent = build_agent()
-def _run_tool_agent(state: Dict) -> Dict:
-    try:
-        res = ToolAgent.invoke({"input": state["input"]})
-    except Exception as e:
-        # graceful response instead of 500
-        return {
-            "output": "I couldn't extract enough info to search flights. "
-                      "Please provide origin (IATA), destination (IATA), and departure date (YYYY-MM-DD).",
-            "context": state.get("context", {}),
-            "error": str(e)[:200],
-            "suggestions": [
-                "Search AMM → DOH on 2025-10-10",
-                "Search AMM → DXB on 2025-11-05 (return 2025-11-10)",
-            ],
-        }
+
+def _agent_failed(state: Dict, e: Exception) -> Dict:
+    # graceful response instead of 500
+    return {
+        "output": "I couldn't extract enough info to search flights. "
+                  "Please provide origin, destination (city or IATA code), and departure date (YYYY-MM-DD).",
+        "context": state.get("context", {}),
+        "error": str(e)[:200],
+        "suggestions": [
+            "Search AMM → DOH on 2025-10-10",
+            "Search AMM → DXB on 2025-11-05 (return 2025-11-10)",
+        ],
+    }
+
+def _agent_output(state: Dict, res) -> Dict:
     out = {"context": state.get("context", {})}
     if isinstance(res, dict):
         out.update(res)
@@ -42,14 +66,120 @@ def _run_tool_agent(state: Dict) -> Dict:
         out["output"] = str(res)
     return out
 
-ToolAgentRunnable = RunnableLambda(_run_tool_agent)
+def _run_tool_agent(state: Dict) -> Dict:
+    spent = []
+    token = turn_tokens.set(spent)
+    try:
+        with span("agent", "tool_agent"):
+            res = ToolAgent.invoke({"input": state["input"]})
+    except Exception as e:
+        return _agent_failed(state, e)
+    finally:
+        turn_tokens.reset(token)
+        record_turn(spent)
+    return _agent_output(state, res)
+
+async def _arun_tool_agent(state: Dict) -> Dict:
+    spent = []
+    token = turn_tokens.set(spent)
+    try:
+        with span("agent", "tool_agent"):
+            res = await ToolAgent.ainvoke({"input": state["input"]})
+    except Exception as e:
+        return _agent_failed(state, e)
+    finally:
+        turn_tokens.reset(token)
+        record_turn(spent)
+    return _agent_output(state, res)
+
+# --- streaming (/agent/stream) ---
+# Chunks are AddableDicts so LangServe (and invoke on the streaming path) can merge them:
+#   {"context": ...}                        intent/policy decision, first
+#   {"events": [{"type": "tool_start"...}]} tool progress, list-concatenated
+#   {"output": "<token>"}                   answer tokens, string-concatenated
+# followed by any remaining keys of the final agent result.
+
+def _last(chunks: Iterator[Dict]) -> Dict:
+    state = None
+    for state in chunks:
+        pass
+    return state
+
+def _stream_tool_agent(chunks: Iterator[Dict]) -> Iterator[Dict]:
+    # sync stream: no token-level events, one chunk with the whole result
+    yield AddableDict(_run_tool_agent(_last(chunks)))
+
+def _tool_event(ev: Dict, started: Dict[str, float]) -> Dict | None:
+    kind = ev["event"]
+    if kind == "on_tool_start":
+        started[ev["run_id"]] = time.perf_counter()
+        return {"type": "tool_start", "tool": ev["name"], "input": ev["data"].get("input")}
+    if kind == "on_tool_end" or kind == "on_tool_error":
+        t0 = started.pop(ev["run_id"], None)
+        out = ev["data"].get("output")
+        failed = kind == "on_tool_error" or (isinstance(out, dict) and "error" in out)
+        return {
+            "type": "tool_end",
+            "tool": ev["name"],
+            "ms": round((time.perf_counter() - t0) * 1000, 1) if t0 is not None else None,
+            "ok": not failed,
+        }
+    return None
+
+async def _astream_tool_agent(chunks: AsyncIterator[Dict]) -> AsyncIterator[Dict]:
+    state = None
+    async for state in chunks:
+        pass
+    yield AddableDict(context=state.get("context", {}))
+    spent, started = [], {}
+    token = turn_tokens.set(spent)
+    streamed, final, root = False, None, None
+    t0 = time.perf_counter()
+    try:
+        async for ev in ToolAgent.astream_events({"input": state["input"]}, version="v2"):
+            kind = ev["event"]
+            # the first event is the agent's own start; parent_ids is non-empty when
+            # this runs nested inside the router's run
+            root = root or ev["run_id"]
+            if kind == "on_chat_model_stream":
+                text = ev["data"]["chunk"].content
+                if isinstance(text, str) and text:
+                    streamed = True
+                    yield AddableDict(output=text)
+            elif kind == "on_chain_end" and ev["run_id"] == root:
+                # streamed runs end with a "messages" list that invoke does not return
+                final = {k: v for k, v in (ev["data"].get("output") or {}).items() if k != "messages"}
+            else:
+                event = _tool_event(ev, started)
+                if event is not None:
+                    yield AddableDict(events=[event])
+        res = _agent_output(state, {"input": state["input"], **(final or {})})
+    except Exception as e:
+        res = _agent_failed(state, e)
+    finally:
+        try:
+            turn_tokens.reset(token)
+        except ValueError:
+            pass  # generator resumed in another context; the value dies with it
+        record_turn(spent)
+        observe("flightai_stage_seconds", time.perf_counter() - t0, stage="agent", op="tool_agent_stream")
+    rest = {k: v for k, v in res.items() if k != "context"}
+    if streamed:
+        # tokens already carried the answer (a cached LLM reply streams nothing)
+        rest.pop("output", None)
+    if rest:
+        yield AddableDict(rest)
+
+ToolAgentRunnable = StreamingLambda(
+    _run_tool_agent, _arun_tool_agent, _stream_tool_agent, _astream_tool_agent, name="ToolAgent"
+)
 
 # build the router: classify → branch → (selected runnable)
-Classifier = RunnableLambda(_classify)
+Classifier = RunnableLambda(_classify, afunc=_aclassify)
 
 Branch = RunnableBranch(
-    (_is_out_of_scope, OutOfScopeResponder),
-    (_is_small_talk, SmallTalkResponder),
+    (inline_lambda(_is_out_of_scope), OutOfScopeResponder),
+    (inline_lambda(_is_small_talk), SmallTalkResponder),
     ToolAgentRunnable,
 )
 
@@ -61,7 +191,34 @@ def _normalize_output(result: Dict) -> Dict:
         result["output"] = ""
     return result
 
-Router = Classifier | Branch | RunnableLambda(_normalize_output)
+async def _anormalize_output(result: Dict) -> Dict:
+    return _normalize_output(result)
+
+def _stream_normalized(chunks: Iterator[Dict]) -> Iterator[Dict]:
+    seen = set()
+    for chunk in chunks:
+        seen.update(chunk)
+        yield AddableDict(chunk)
+    missing = {k: v for k, v in (("context", {}), ("output", "")) if k not in seen}
+    if missing:
+        yield AddableDict(missing)
+
+async def _astream_normalized(chunks: AsyncIterator[Dict]) -> AsyncIterator[Dict]:
+    seen = set()
+    async for chunk in chunks:
+        seen.update(chunk)
+        yield AddableDict(chunk)
+    missing = {k: v for k, v in (("context", {}), ("output", "")) if k not in seen}
+    if missing:
+        yield AddableDict(missing)
+
+# a buffering RunnableLambda here would hold back every streamed chunk until the end
+Normalize = StreamingLambda(
+    _normalize_output, _anormalize_output, _stream_normalized, _astream_normalized,
+    name="normalize_output",
+)
+
+Router = Classifier | Branch | Normalize
 
 def _adapt_in(x):
     # If client already sent {"input": "..."} keep it
@@ -70,4 +227,4 @@ def _adapt_in(x):
     # Otherwise, treat body as the raw user text
     return {"input": x}
 
-EntryRouter = RunnableLambda(_adapt_in) | Router
+EntryRouter = inline_lambda(_adapt_in) | Router
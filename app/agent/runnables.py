@@ -0,0 +1,39 @@
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+from langchain_core.runnables import RunnableConfig, RunnableGenerator, RunnableLambda
+
+def inline_lambda(fn: Callable) -> RunnableLambda:
+    """RunnableLambda for cheap, non-blocking steps.
+
+    A plain RunnableLambda(fn) runs `fn` in the default thread pool under
+    `ainvoke`/`astream`; giving it an async twin keeps the step on the event loop.
+    """
+    async def afn(x):
+        return fn(x)
+    return RunnableLambda(fn, afunc=afn, name=getattr(fn, "__name__", None))
+
+class StreamingLambda(RunnableGenerator):
+    """A step that streams under stream/astream but invokes as a plain function.
+
+    RunnableLambda buffers its whole input and emits one chunk, which stalls every
+    step after it in a streaming sequence; RunnableGenerator streams but routes
+    invoke/ainvoke through the generator too. This keeps both paths direct.
+    Chunks must be addable (e.g. AddableDict) so streamed output can be combined.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Any], Any],
+        afunc: Callable[[Any], Any],
+        transform: Callable[[Iterator[Any]], Iterator[Any]],
+        atransform: Callable[[AsyncIterator[Any]], AsyncIterator[Any]],
+        name: Optional[str] = None,
+    ):
+        super().__init__(transform, atransform, name=name)
+        self._func = func
+        self._afunc = afunc
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self._call_with_config(self._func, input, config)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self._acall_with_config(self._afunc, input, config)
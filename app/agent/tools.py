@@ -1,16 +1,49 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
 import os
-from typing import Optional, Literal
+from typing import Awaitable, Callable, Optional, Literal
 
 import httpx
-from pydantic import BaseModel, Field, model_validator
-from langchain.tools import tool
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from langchain_core.tools import StructuredTool
+
+from app.config import settings
+from app.schemas import FlightSearchParams, MatrixSearchRequest, PriceVerifyRequest, CreateOrderRequest
+from app.services.flights_service import flights_service, MatrixTooLarge
+from app.services.offer_store import OfferNotFound
+from app.services.idempotency import IdempotencyConflict
+from app.services.rate_limiter import RateLimited
+from app.services.resilience import DeadlineExceeded, within
+from app.services.airports import airports, UnknownLocation
+from app.metrics import span
+from .projection import project, project_search, project_matrix, project_price, project_order
 
 # Where the FastAPI backend is running (the same app that exposes /amadeus/*)
 BASE = os.getenv("AGENT_BACKEND_BASE", "http://127.0.0.1:8000")
 TIMEOUT = float(os.getenv("AGENT_HTTP_TIMEOUT", "45.0"))
 
+# "inprocess" calls the flights service directly; "http" loops back through BASE
+# (only useful when the agent runs in a different deployment than /amadeus/*).
+MODE = settings.AGENT_TOOLS_MODE
+
+_loop: asyncio.AbstractEventLoop | None = None
+_aclient: httpx.AsyncClient | None = None
+
+
+def bind_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Remember the app's event loop so sync tool calls from worker threads can run on it."""
+    global _loop
+    _loop = loop
+
+
+async def aclose() -> None:
+    global _aclient
+    if _aclient is not None:
+        client, _aclient = _aclient, None
+        await client.aclose()
+
 
 def _post(path: str, json: dict) -> dict:
     """POST to our backend and return JSON. Never raise to avoid 500s from the agent path."""
@@ -21,20 +54,44 @@ def _post(path: str, json: dict) -> dict:
             r.raise_for_status()
             return r.json()
     except httpx.HTTPStatusError as e:
-        return {
-            "error": "UPSTREAM_HTTP_ERROR",
-            "status": e.response.status_code,
-            "endpoint": url,
-            "body": json,
-            "detail": _safe_json(e.response),
-        }
+        return _http_error(e, url, json)
     except httpx.RequestError as e:
-        return {
-            "error": "NETWORK_ERROR",
-            "endpoint": url,
-            "body": json,
-            "detail": str(e),
-        }
+        return _network_error(e, url, json)
+
+
+async def _apost(path: str, json: dict) -> dict:
+    """Async variant of `_post` over one shared keep-alive client."""
+    global _aclient
+    if _aclient is None:
+        _aclient = httpx.AsyncClient(timeout=TIMEOUT)
+    url = f"{BASE.rstrip('/')}{path}"
+    try:
+        r = await _aclient.post(url, json=json)
+        r.raise_for_status()
+        return r.json()
+    except httpx.HTTPStatusError as e:
+        return _http_error(e, url, json)
+    except httpx.RequestError as e:
+        return _network_error(e, url, json)
+
+
+def _http_error(e: httpx.HTTPStatusError, endpoint: str, json: dict) -> dict:
+    return {
+        "error": "UPSTREAM_HTTP_ERROR",
+        "status": e.response.status_code,
+        "endpoint": endpoint,
+        "body": json,
+        "detail": _safe_json(e.response),
+    }
+
+
+def _network_error(e: httpx.RequestError, endpoint: str, json: dict) -> dict:
+    return {
+        "error": "NETWORK_ERROR",
+        "endpoint": endpoint,
+        "body": json,
+        "detail": str(e),
+    }
 
 def _safe_json(resp: httpx.Response) -> dict | str:
     try:
@@ -42,9 +99,100 @@ def _safe_json(resp: httpx.Response) -> dict | str:
     except Exception:
         return resp.text
 
+
+async def _dispatch(path: str, call: Callable[[dict], Awaitable[dict]], json: dict) -> dict:
+    """Run one tool call in-process (or over HTTP in "http" mode) with `_post`'s error shape."""
+    if MODE == "http":
+        return await _apost(path, json)
+    try:
+        # each tool call gets at most AGENT_HTTP_TIMEOUT, within the request's own deadline
+        with within(TIMEOUT):
+            return await call(json)
+    except ValidationError as e:
+        return {"error": "INVALID_ARGUMENTS", "endpoint": path, "body": json, "detail": str(e)}
+    except OfferNotFound as e:
+        return {"error": "OFFER_NOT_FOUND", "endpoint": path, "body": json, "detail": str(e)}
+    except MatrixTooLarge as e:
+        return {"error": "INVALID_ARGUMENTS", "endpoint": path, "body": json, "detail": str(e)}
+    except IdempotencyConflict as e:
+        return {"error": "IDEMPOTENCY_CONFLICT", "endpoint": path, "body": json, "detail": str(e)}
+    except RateLimited as e:
+        return {"error": "RATE_LIMITED", "endpoint": path, "body": json, "detail": str(e), "retryAfter": e.retry_after}
+    except DeadlineExceeded as e:
+        return {"error": "TIMEOUT", "endpoint": path, "body": json, "detail": str(e)}
+    except httpx.HTTPStatusError as e:
+        return _http_error(e, path, json)
+    except httpx.RequestError as e:
+        return _network_error(e, path, json)
+    except Exception as e:
+        return {"error": "UPSTREAM_ERROR", "endpoint": path, "body": json, "detail": str(e)}
+
+
+def _run_sync(path: str, call: Callable[[dict], Awaitable[dict]], json: dict) -> dict:
+    # Sync callers (e.g. AgentExecutor.invoke in a worker thread) borrow the app loop
+    # so the shared Amadeus pool is reused; outside the app there is no loop to borrow.
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        # waiting here would block that loop (and deadlock when it is the app loop)
+        raise RuntimeError(f"sync call of {path} from a running event loop; use the async tool (ainvoke)")
+    if _loop is not None and _loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(_dispatch(path, call, json), _loop)
+        try:
+            # `_dispatch` normally reports its own TIMEOUT first; this only backs it up
+            return future.result(TIMEOUT + 1)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return {"error": "TIMEOUT", "endpoint": path, "body": json,
+                    "detail": f"tool call did not finish within {TIMEOUT}s"}
+    return asyncio.run(_dispatch(path, call, json))
+
+
+def _locate(path: str, json: dict, fields: tuple[str, ...]) -> dict | None:
+    """Swap city/airport names in `fields` for IATA codes (in place); the error result if one has no single match."""
+    try:
+        for field in fields:
+            value = json.get(field)
+            if isinstance(value, list):
+                json[field] = [airports.code_for(v) for v in value]
+            elif value:
+                json[field] = airports.code_for(value)
+    except UnknownLocation as e:
+        return {
+            "error": "UNKNOWN_LOCATION", "endpoint": path, "body": json, "detail": str(e),
+            "candidates": [f'{c["code"]} {c["name"]} ({c["city"]}, {c["country"]})' for c in e.candidates],
+        }
+    return None
+
+
+def _make_tool(name: str, args_schema: type[BaseModel], description: str,
+               path: str, call: Callable[[dict], Awaitable[dict]],
+               compact: Callable[[dict], dict], places: tuple[str, ...] = ()) -> StructuredTool:
+    # Place names in `places` are resolved locally, so the LLM never has to guess IATA codes.
+    # Results are projected to a compact, token-budgeted view before the LLM sees them.
+    async def acall(**kwargs) -> dict:
+        with span("tool", name):
+            failed = _locate(path, kwargs, places)
+            return project(failed or await _dispatch(path, call, kwargs), compact)
+
+    def scall(**kwargs) -> dict:
+        with span("tool", name):
+            failed = _locate(path, kwargs, places)
+            if failed:
+                return project(failed, compact)
+            if MODE == "http":
+                return project(_post(path, kwargs), compact)
+            return project(_run_sync(path, call, kwargs), compact)
+
+    return StructuredTool.from_function(
+        func=scall, coroutine=acall, name=name, description=description, args_schema=args_schema,
+    )
+
 class SearchOffersArgs(BaseModel):
-    originLocationCode: str = Field(..., description="Origin IATA code, e.g. AMM")
-    destinationLocationCode: str = Field(..., description="Destination IATA code, e.g. DOH")
+    originLocationCode: str = Field(..., description="Origin IATA code or city/airport name, e.g. AMM or Amman")
+    destinationLocationCode: str = Field(..., description="Destination IATA code or city/airport name, e.g. DOH or Doha")
     departureDate: str = Field(..., description="YYYY-MM-DD")
     returnDate: Optional[str] = Field(None, description="YYYY-MM-DD (round-trip)")
     adults: int = 1
@@ -55,18 +203,44 @@ class SearchOffersArgs(BaseModel):
     currencyCode: str = "USD"
     max: int = 10
 
-@tool("search_offers", args_schema=SearchOffersArgs)
-def search_offers_tool(**kwargs) -> dict:
-    """
-    Search flight offers (Amadeus Flight Offers Search).
-    Calls our backend: POST /amadeus/search with the same JSON body.
-    """
-    return _post("/amadeus/search", kwargs)
+async def _search(args: dict) -> dict:
+    # the LLM only sees the projection, so skip embedding raw offers
+    return await flights_service.search(FlightSearchParams(**args), raw="none")
+
+search_offers_tool = _make_tool(
+    "search_offers", SearchOffersArgs,
+    "Search flight offers (Amadeus Flight Offers Search). Returns the cheapest offers, "
+    "each with a short offerId to pass to price_offer / create_order.",
+    "/amadeus/search?raw=none", _search, project_search,
+    places=("originLocationCode", "destinationLocationCode"),
+)
+
+class SearchMatrixArgs(BaseModel):
+    origins: list[str] = Field(..., description="Origin IATA codes or city names, e.g. ['AMM']")
+    destinations: list[str] = Field(..., description="Destination IATA codes or city names, e.g. ['DOH', 'Dubai']")
+    departFrom: str = Field(..., description="First departure date, YYYY-MM-DD")
+    departTo: Optional[str] = Field(None, description="Last departure date, YYYY-MM-DD (flexible dates)")
+    stayDays: Optional[int] = Field(None, description="Round trip: days between departure and return")
+    adults: int = 1
+    travelClass: Optional[Literal["ECONOMY", "PREMIUM_ECONOMY", "BUSINESS", "FIRST"]] = None
+    nonStop: bool = False
+    currencyCode: str = "USD"
+
+async def _search_matrix(args: dict) -> dict:
+    return await flights_service.search_matrix(MatrixSearchRequest(**args))
+
+search_matrix_tool = _make_tool(
+    "search_matrix", SearchMatrixArgs,
+    "Cheapest flights across several origins/destinations and/or a range of departure dates "
+    "(e.g. 'any day next week', 'DOH or DXB'). Returns the cheapest cells with offerIds and a price grid.",
+    "/amadeus/search/matrix", _search_matrix, project_matrix,
+    places=("origins", "destinations"),
+)
 
 class PriceOfferArgs(BaseModel):
     # Support either an Amadeus offer id OR the raw offer object, plus optional currency override.
     offerId: Optional[str] = Field(
-        None, description="ID of the offer returned by /amadeus/search"
+        None, description="offerId returned by search_offers ('searchId:offerId')"
     )
     offer: Optional[dict] = Field(
         None, description="Raw offer object returned by Amadeus search"
@@ -81,19 +255,19 @@ class PriceOfferArgs(BaseModel):
             raise ValueError("Provide either offerId or offer")
         return self
 
+async def _price(args: dict) -> dict:
+    return await flights_service.price(PriceVerifyRequest(**args))
 
-@tool("price_offer", args_schema=PriceOfferArgs)
-def price_offer_tool(**kwargs) -> dict:
-    """
-    Verify pricing for a selected offer (Amadeus Flight Offers Price).
-    Calls our backend: POST /amadeus/price with the same JSON body.
-    """
-    return _post("/amadeus/price", kwargs)
+price_offer_tool = _make_tool(
+    "price_offer", PriceOfferArgs,
+    "Verify pricing for a selected offer (Amadeus Flight Offers Price).",
+    "/amadeus/price", _price, project_price,
+)
 
 class CreateOrderArgs(BaseModel):
     # Minimal inputs; your backend can accept either an offerId or the raw offer + traveler details.
     offerId: Optional[str] = Field(
-        None, description="ID of the priced offer to purchase"
+        None, description="offerId returned by price_offer ('searchId:offerId')"
     )
     offer: Optional[dict] = Field(
         None, description="Raw priced offer object from Amadeus"
@@ -111,11 +285,11 @@ class CreateOrderArgs(BaseModel):
             raise ValueError("Provide either offerId or offer")
         return self
 
+async def _create_order(args: dict) -> dict:
+    return await flights_service.create_order(CreateOrderRequest(**args))
 
-@tool("create_order", args_schema=CreateOrderArgs)
-def create_order_tool(**kwargs) -> dict:
-    """
-    Create a (sandbox) flight order (Amadeus Flight Create Orders).
-    Calls our backend: POST /amadeus/create-order with the same JSON body.
-    """
-    return _post("/amadeus/create-order", kwargs)
+create_order_tool = _make_tool(
+    "create_order", CreateOrderArgs,
+    "Create a (sandbox) flight order (Amadeus Flight Create Orders).",
+    "/amadeus/create-order", _create_order, project_order,
+)
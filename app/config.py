@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal
 from pydantic import field_validator
 
 class Settings(BaseSettings):
@@ -7,12 +7,124 @@ class Settings(BaseSettings):
     AMADEUS_API_KEY: str
     AMADEUS_API_SECRET: str
     DATABASE_URL: str
+    # DB_ASYNC=true serves /trips/* through asyncpg/aiosqlite instead of the threadpool
+    DB_ASYNC: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: float = 30.0
     REDIS_URL: str = "redis://localhost:6379/0"
     OPENAI_API_KEY: str
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
     AGENT_INTENT_THRESHOLD: float = 0.70
     AGENT_BACKEND_BASE: str = "http://localhost:8000"
     AGENT_HTTP_TIMEOUT: float = 45
+    # "inprocess": agent tools call the flights service directly; "http": loop back via AGENT_BACKEND_BASE
+    AGENT_TOOLS_MODE: Literal["inprocess", "http"] = "inprocess"
+    # Local rule-based intent fast path; only answers when at least this confident
+    AGENT_PREFILTER_ENABLED: bool = True
+    AGENT_PREFILTER_MIN_CONFIDENCE: float = 0.9
+
+    # Compact tool results for the agent LLM
+    AGENT_TOOL_MAX_OFFERS: int = 5
+    AGENT_TOOL_TOKEN_BUDGET: int = 1200
+
+    # LLM response cache (classifier + agent): memory LRU plus "redis" or "sqlite" persistence
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_BACKEND: Literal["memory", "redis", "sqlite"] = "memory"
+    LLM_CACHE_TTL: float = 3600.0
+    LLM_CACHE_MAX_ENTRIES: int = 2000
+    LLM_CACHE_SQLITE_PATH: str = ".llm_cache.sqlite"
+
+    # Amadeus connection pool (shared, opened on startup / closed on shutdown)
+    AMADEUS_MAX_CONNECTIONS: int = 100
+    AMADEUS_MAX_KEEPALIVE: int = 20
+    AMADEUS_KEEPALIVE_EXPIRY: float = 30.0
+    AMADEUS_HTTP2: bool = True
+    AMADEUS_CONNECT_TIMEOUT: float = 5.0
+    AMADEUS_TOKEN_TIMEOUT: float = 10.0
+    AMADEUS_SEARCH_TIMEOUT: float = 30.0
+    AMADEUS_PRICE_TIMEOUT: float = 30.0
+    AMADEUS_ORDER_TIMEOUT: float = 30.0
+    # OAuth token: refresh this many seconds before expiry; share via Redis across workers
+    AMADEUS_TOKEN_REFRESH_MARGIN: float = 120.0
+    AMADEUS_TOKEN_SHARED: bool = False
+
+    # Upstream rate limit (token bucket, shared via Redis): requests/second, burst, queued
+    # callers and how long one may wait for a slot. 429s lower the rate automatically.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_RPS: float = 10.0
+    RATE_LIMIT_BURST: float = 10.0
+    RATE_LIMIT_QUEUE_MAX: int = 500
+    RATE_LIMIT_MAX_WAIT: float = 10.0
+    RATE_LIMIT_429_RETRIES: int = 2
+
+    # Time budget per request (X-Request-Timeout can shorten it; /agent/* uses AGENT_HTTP_TIMEOUT)
+    REQUEST_TIMEOUT: float = 30.0
+    # search/price retry 5xx and network errors with full-jitter backoff (create-order never does)
+    AMADEUS_RETRIES: int = 2
+    AMADEUS_RETRY_BASE_DELAY: float = 0.2
+    AMADEUS_RETRY_MAX_DELAY: float = 2.0
+    # a slow search gets a duplicate after its recent latency quantile; at most MAX_RATIO extra calls
+    AMADEUS_HEDGE_ENABLED: bool = True
+    AMADEUS_HEDGE_QUANTILE: float = 0.95
+    AMADEUS_HEDGE_MIN_DELAY: float = 0.25
+    AMADEUS_HEDGE_MAX_RATIO: float = 0.1
+    # circuit breaker: open at FAILURE_RATIO failures over the last WINDOW calls, probe after COOLDOWN
+    AMADEUS_BREAKER_WINDOW: int = 20
+    AMADEUS_BREAKER_MIN_CALLS: int = 10
+    AMADEUS_BREAKER_FAILURE_RATIO: float = 0.5
+    AMADEUS_BREAKER_COOLDOWN: float = 15.0
+
+    # /amadeus/search cache: fresh for TTL, then served stale (with background refresh) for STALE_TTL
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL: float = 120.0
+    SEARCH_CACHE_STALE_TTL: float = 600.0
+    SEARCH_CACHE_LOCAL_MAX: int = 1000
+    # past STALE_TTL, results are kept this much longer and served only while Amadeus is unavailable
+    SEARCH_CACHE_ERROR_TTL: float = 3600.0
+    # default `raw` embedding in /amadeus/search offers: full | none | ref
+    SEARCH_RAW_MODE: Literal["full", "none", "ref"] = "full"
+
+    # keep the most searched route/dates warm: every INTERVAL refresh up to TOP_N queries seen at
+    # least MIN_HITS times (decaying with HALF_LIFE) before they go stale, within CALLS_PER_MINUTE
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_INTERVAL: float = 30.0
+    PREFETCH_TOP_N: int = 50
+    PREFETCH_MIN_HITS: float = 2.0
+    PREFETCH_HALF_LIFE: float = 3600.0
+    PREFETCH_CALLS_PER_MINUTE: float = 20.0
+    PREFETCH_TRACK_MAX: int = 5000
+
+    # /amadeus/search/matrix fan-out: cell cap, concurrent upstream searches, per-cell deadline
+    MATRIX_MAX_CELLS: int = 60
+    MATRIX_CONCURRENCY: int = 6
+    MATRIX_CELL_TIMEOUT: float = 15.0
+
+    # /trips/list meta.total: exact COUNT(*), planner estimate (Postgres), or none
+    TRIPS_LIST_TOTAL: Literal["exact", "estimate", "none"] = "exact"
+    # most trips accepted by one /trips/bulk-save or /trips/bulk-delete call
+    TRIPS_BULK_MAX: int = 1000
+
+    # Raw offers kept server-side so price/create-order can take an offerId
+    OFFER_STORE_TTL: float = 1800.0
+    OFFER_STORE_LOCAL_MAX: int = 20000
+
+    # create-order replays the stored result for a repeated idempotencyKey (or identical body)
+    IDEMPOTENCY_TTL: float = 86400.0
+    # requests without a key are deduplicated on offer + travelers for a shorter window
+    IDEMPOTENCY_BODY_TTL: float = 600.0
+    IDEMPOTENCY_LOCAL_MAX: int = 10000
+
+    # create-order persists reservations through a background write queue
+    RESERVATION_WRITE_BATCH: int = 100
+    RESERVATION_WRITE_BACKLOG: int = 10000
+    RESERVATION_WRITE_INTERVAL: float = 0.5
+    RESERVATION_WRITE_RETRIES: int = 3
+
+    # Redis is optional everywhere; an empty REDIS_URL disables it
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_RETRY_AFTER: float = 30.0
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,61 @@
+"""Regenerate app/data/airports.tsv from the `airportsdata` package (build time only).
+
+    pip install airportsdata && python -m app.data.build_airports
+
+Keeps every airport with an IATA code plus the IATA metropolitan-area ("city") codes,
+one tab-separated row each: code, kind (A airport / C city), name, city, region,
+country, metro code, rank. Rank orders candidates that share a name: city codes
+first, then the primary commercial airports below (earlier = busier), then airports
+named "International", then the rest.
+"""
+import csv, os, sys
+
+# Primary passenger airport(s) of their city, roughly busiest first. Only needed where a
+# name is shared (Doha: DOH/DIA, Amman: AMM/ADJ, Dublin IE/US, Manchester GB/US, ...).
+PRIMARY = """
+ATL DXB DFW LHR HND DEN IST LAX ORD DEL CDG JFK CAN PVG PEK AMS FRA MAD BCN SIN ICN BKK CGK LAS MCO
+CLT MIA SEA PHX EWR SFO IAH BOS FLL MSP LGA DTW PHL SLC DCA SAN BWI TPA AUS IAD BNA MDW HNL DAL STL
+HOU OAK SJC SMF PDX RDU MSY SAT MCI CLE IND PIT CMH CVG BOM BLR MAA HYD CCU COK GOI AMD PNQ TRV
+DOH AUH SHJ RUH JED DMM MED KWI BAH MCT AMM BEY TLV CAI HRG SSH HBE LXR CMN RAK TUN ALG ADD NBO
+MBA DAR ZNZ EBB KGL LOS ABV ACC DKR JNB CPT DUR MRU SEZ LAD LUN HRE WDH KRT IKA MHD BGW EBL KHI
+LHE ISB CMB MLE KTM DAC HKT CNX KUL PEN BKI DPS SUB MNL CEB SGN HAN DAD KTI SAI RGN HKG MFM TPE
+KHH PUS CJU NRT KIX NGO CTS FUK OKA SZX CTU CKG KMG XIY HGH NKG WUH CSX XMN TAO SHE DLC HRB URC
+TSN ULN ALA NQZ TAS GYD TBS EVN BSZ SYD MEL BNE PER ADL OOL CBR CNS AKL WLG CHC ZQN NAN PPT NOU
+POM YYZ YVR YUL YYC YEG YOW YHZ YWG MEX CUN GDL MTY TIJ SJD PVR SJU PTY SJO SAL GUA HAV SDQ PUJ
+MBJ NAS BGI POS AUA CUR GRU GIG BSB CNF SSA REC FOR POA CWB EZE SCL LIM BOG MDE CTG CLO UIO GYE
+CCS MVD ASU VVI LPB LGW MAN STN LTN BHX EDI GLA BRS DUB ORY NCE LYS MRS TLS BOD NTE BRU MUC DUS
+BER HAM CGN STR HAJ ZRH GVA BSL VIE PRG BUD WAW KRK GDN CPH ARN OSL BGO HEL KEF PMI AGP ALC VLC
+SVQ BIO LPA TFS IBZ LIS OPO FAO FCO MXP BGY VCE NAP BLQ CTA PMO FLR PSA ATH SKG HER RHO JTR CFU
+SAW AYT ESB ADB DLM BJV SOF OTP BEG ZAG LJU TIA SKP SJJ KBP RMO RIX VNO TLL SVO LED MLA LCA PFO
+"""
+
+
+def main(src: str, out: str):
+    primary = PRIMARY.split()
+    rank = {code: 10000 - i for i, code in enumerate(primary)}
+    with open(os.path.join(src, "airports.csv"), encoding="utf-8") as f:
+        airports = [r for r in csv.DictReader(f) if r["iata"]]
+    with open(os.path.join(src, "iata_macs.csv"), encoding="utf-8-sig") as f:
+        macs = list(csv.DictReader(f))
+    metro = {r["Airport Code"]: r["City Code"] for r in macs}
+
+    rows = []
+    for code, city, country in sorted({(r["City Code"], r["City Name"], r["Country"]) for r in macs}):
+        rows.append((code, "C", f"{city} (all airports)", city, "", country, "", 20000))
+    for r in airports:
+        score = rank.get(r["iata"], 1 if "International" in r["name"] else 0)
+        rows.append((r["iata"], "A", r["name"], r["city"], r["subd"], r["country"], metro.get(r["iata"], ""), score))
+    missing = set(primary) - {r["iata"] for r in airports}
+    if missing:
+        sys.exit(f"primary airports missing from the dataset: {sorted(missing)}")
+
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        f.write("# IATA airports and metro codes from airportsdata (MIT, https://github.com/mborsetti/airportsdata)\n")
+        for row in rows:
+            f.write("\t".join(str(v).replace("\t", " ") for v in row) + "\n")
+    print(f"wrote {len(rows)} rows to {out}")
+
+
+if __name__ == "__main__":
+    import airportsdata
+    main(os.path.dirname(airportsdata.__file__), os.path.join(os.path.dirname(__file__), "airports.tsv"))
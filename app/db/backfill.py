@@ -0,0 +1,60 @@
+"""Bring an existing trips table up to date with TripModel.
+
+The app creates tables with `create_all` (no migrations), which never alters an
+existing table, so new summary columns/indexes are added here and old rows get their
+summary extracted from `data`:
+
+    python -m app.db.backfill
+"""
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from app.db.models import TripModel
+from app.services.trips_service import SUMMARY_FIELDS, extract_summary
+
+def ensure_trip_columns(engine: Engine):
+    table = TripModel.__table__
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for col in table.columns:
+            if col.name not in existing:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(engine.dialect)}"))
+    ensure_indexes(engine, table)
+
+def ensure_indexes(engine: Engine, table):
+    # create_all skips new indexes on tables that already exist
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+
+def backfill_summaries(engine: Engine, batch: int = 1000) -> int:
+    """Fill summary columns for rows saved before they existed; returns rows updated."""
+    table = TripModel.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values({f: bindparam(f"b_{f}") for f in SUMMARY_FIELDS})
+    )
+    last_id, updated = 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.data)
+                .where(table.c.id > last_id, table.c.origin.is_(None), table.c.price_amount.is_(None))
+                .order_by(table.c.id)
+                .limit(batch)
+            ).all()
+            if not rows:
+                return updated
+            params = []
+            for trip_id, data in rows:
+                summary = extract_summary(data)
+                if any(v is not None for v in summary.values()):
+                    params.append({"b_id": trip_id, **{f"b_{k}": v for k, v in summary.items()}})
+            if params:
+                conn.execute(stmt, params)
+            updated += len(params)
+            last_id = rows[-1][0]
+
+if __name__ == "__main__":
+    from app.deps import engine
+    ensure_trip_columns(engine)
+    print(f"backfilled {backfill_summaries(engine)} trips")
@@ -1,18 +1,33 @@
 from typing import Optional, Any
 from sqlmodel import SQLModel, Field
-from datetime import datetime
-from sqlalchemy import Column, JSON
+from datetime import datetime, date
+from sqlalchemy import Column, JSON, Index
 
 class TripModel(SQLModel, table=True):
+    # /trips/list pages newest-first by (created_at, id) keyset
+    __table_args__ = (
+        Index("ix_tripmodel_created_at_id", "created_at", "id"),
+        Index("ix_tripmodel_route", "origin", "destination", "depart_date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     offer_id: str
     data: dict = Field(sa_column=Column(JSON))
     note: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # card summary extracted from `data` at save time (see trips_service.extract_summary)
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    depart_date: Optional[date] = Field(default=None, index=True)
+    return_date: Optional[date] = None
+    stops: Optional[int] = None
+    price_amount: Optional[float] = Field(default=None, index=True)
+    currency: Optional[str] = None
+    carrier: Optional[str] = None
 
 class ReservationModel(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    reservation_id: str
+    reservation_id: str = Field(index=True)
     status: str
     pnr: Optional[str] = None
     offer: dict = Field(sa_column=Column(JSON))
@@ -1,9 +1,49 @@
-import os
+import inspect, os
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.config import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=False, pool_pre_ping=True)
+def _pool_kwargs(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    u = make_url(url)
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(u.get_backend_name())
+    if driver is None:
+        raise ValueError(f"no async driver configured for {u.get_backend_name()!r}")
+    return u.set(drivername=f"{u.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+# The sync engine is always created: startup DDL and backfills use it.
+engine = create_engine(settings.DATABASE_URL, echo=False, pool_pre_ping=True, **_pool_kwargs(settings.DATABASE_URL))
+
+async_engine = None
+if settings.DB_ASYNC:
+    _async_url = async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(_async_url, echo=False, pool_pre_ping=True, **_pool_kwargs(_async_url))
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+# Session dependency selected by DB_ASYNC; routers call services through run_db either way.
+get_db = get_async_session if settings.DB_ASYNC else get_session
+
+async def run_db(fn, *args):
+    if inspect.iscoroutinefunction(fn):
+        return await fn(*args)
+    return await run_in_threadpool(fn, *args)
@@ -1,16 +1,32 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio, time
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
 from sqlmodel import SQLModel
 from app.config import settings
+from app import metrics
 from app.db.models import TripModel, ReservationModel
-from app.routers import amadeus as amadeus_router, trips as trips_router
+from app.db.backfill import ensure_trip_columns, ensure_indexes
+from app.routers import amadeus as amadeus_router, trips as trips_router, reservations as reservations_router, agent as agent_router
+from app.routers import airports as airports_router
+from app.services.amadeus_client import amadeus
+from app.services.airports import airports
+from app.services.redis_client import close_redis
+from app.services.reservation_writer import reservation_writer
+from app.services.prefetch import prefetcher
+from app.services.rate_limiter import rate_limiter
+from app.services.resilience import within, breaker as amadeus_breaker
 
 # LangServe
 from langserve import add_routes
 from app.agent.router import EntryRouter as AgentRouter
+from app.agent import tools as agent_tools
+from app.agent.llm_cache import cache_bypass
 
 
 print("CORS:", settings.CORS_ORIGINS)
@@ -28,19 +44,119 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class RequestContext:
+    """Per-request context and metrics, as one pure ASGI middleware (no extra task or
+    stream per request; streaming bodies pass straight through).
+
+    - `X-LLM-Cache: bypass` forces fresh model calls for this request (debugging)
+    - every request gets a time budget that bounds its Amadeus calls (see
+      app/services/resilience.py); a client can shorten it with `X-Request-Timeout: <seconds>`
+    - latency per route template (not raw path, so ids do not explode the label set),
+      timed to the response start (streams: first byte)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _budget(path: str, headers: Headers) -> float:
+        budget = settings.AGENT_HTTP_TIMEOUT if path.startswith("/agent") else settings.REQUEST_TIMEOUT
+        try:
+            asked = float(headers.get("x-request-timeout", budget))
+        except ValueError:
+            return budget
+        # only a positive, finite value may shorten the budget (0 or -5 would switch the deadline off)
+        return asked if 0 < asked < budget else budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        t0 = time.perf_counter()
+        status = None
+
+        def record(code: int):
+            metrics.observe(
+                "flightai_http_request_seconds", time.perf_counter() - t0,
+                method=scope["method"], route=getattr(scope.get("route"), "path", "unmatched"), status=code,
+            )
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                record(status)
+            await send(message)
+
+        bypass = cache_bypass.set(True) if headers.get("x-llm-cache", "").lower() == "bypass" else None
+        try:
+            with within(self._budget(scope["path"], headers)):
+                await self.app(scope, receive, timed_send)
+        finally:
+            if status is None:
+                record(500)
+            if bypass is not None:
+                cache_bypass.reset(bypass)
+
+# added last, so it wraps CORS and everything else
+app.add_middleware(RequestContext)
+
+metrics.gauge("flightai_amadeus_in_flight", lambda: {(): amadeus.pool_stats()["inFlight"]},
+              "Amadeus requests currently in flight")
+metrics.gauge("flightai_rate_limit_rps", lambda: {(): rate_limiter.rate}, "Current adaptive Amadeus request rate")
+metrics.gauge("flightai_rate_limit_waiting",
+              lambda: {(("priority", p),): n for p, n in rate_limiter.stats()["waiting"].items()},
+              "Calls queued for an Amadeus slot")
+metrics.gauge("flightai_amadeus_circuit_open", lambda: {(): amadeus_breaker.state != "closed"},
+              "1 while the Amadeus circuit breaker is open or probing")
+metrics.gauge("flightai_reservation_backlog", lambda: {(): reservation_writer.stats()["backlog"]},
+              "Reservations queued for the write-behind insert")
+
 # Create tables on startup (simple dev behavior)
 @app.on_event("startup")
 def on_startup():
     from app.deps import engine
     SQLModel.metadata.create_all(engine)
+    # add columns/indexes introduced since the table was created (rows: python -m app.db.backfill)
+    ensure_trip_columns(engine)
+    ensure_indexes(engine, ReservationModel.__table__)
+
+# Shared upstream connection pool lives for the whole app lifetime
+@app.on_event("startup")
+async def open_clients():
+    await amadeus.start()
+    reservation_writer.start()
+    prefetcher.start()
+    # build the airport index now rather than on the first autocomplete keystroke
+    await asyncio.to_thread(airports.load)
+    agent_tools.bind_loop(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def close_clients():
+    # flush queued reservations while the database engines are still open
+    await reservation_writer.stop()
+    await prefetcher.stop()
+    await amadeus.close()
+    await agent_tools.aclose()
+    await close_redis()
+    from app.deps import async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
 
 # Routers
 app.include_router(amadeus_router.router)
 app.include_router(trips_router.router)
+app.include_router(reservations_router.router)
+app.include_router(agent_router.router)
+app.include_router(airports_router.router)
 
 # Agent (LangServe)
 add_routes(app, AgentRouter, path="/agent")
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health():
     return {"ok": True, "ts": "2025-09-19T11:24:59.115514Z"}
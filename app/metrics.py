@@ -0,0 +1,175 @@
+"""In-process latency histograms and counters, rendered in Prometheus text format.
+
+Kept dependency-free and cheap: one lock-protected bucket increment per observation.
+Everything a request spends time on is recorded under `flightai_stage_seconds` with
+a `stage` (classify, agent, llm, tool, amadeus, normalize, db) and an `op` label.
+
+    with span("db", "trips.list"): ...
+    @timed("db", "trips.save")
+    def save(...): ...
+"""
+import asyncio, functools, threading, time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# seconds; covers a prefilter hit (~µs) up to a slow LLM / booking call
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms: Dict[tuple, list] = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_counters: Dict[tuple, float] = {}   # (name, labels) -> value
+_gauges: Dict[str, Callable[[], Dict[tuple, float]]] = {}
+_help: Dict[str, tuple[str, str]] = {}
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def describe(name: str, kind: str, text: str):
+    _help[name] = (kind, text)
+
+def observe(name: str, seconds: float, **labels):
+    key = (name, _labels(labels))
+    i = bisect_left(BUCKETS, seconds)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        h[i] += 1
+        h[-1] += seconds
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge(name: str, fn: Callable[[], Dict[tuple, float]], text: str = ""):
+    """Register a gauge read at scrape time; `fn` returns {labels tuple: value}."""
+    _gauges[name] = fn
+    describe(name, "gauge", text)
+
+class span:
+    """Time a block into flightai_stage_seconds{stage, op}; usable in sync and async code."""
+    __slots__ = ("stage", "op", "t0")
+
+    def __init__(self, stage: str, op: str):
+        self.stage = stage
+        self.op = op
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe("flightai_stage_seconds", time.perf_counter() - self.t0, stage=self.stage, op=self.op)
+        # a cancelled call (e.g. the losing half of a hedged request) is not an error
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            inc("flightai_stage_errors_total", stage=self.stage, op=self.op)
+        return False
+
+def timed(stage: str, op: str):
+    """Decorator form of `span` for plain and async functions."""
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with span(stage, op):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, op):
+                return fn(*args, **kwargs)
+        return wrapper
+    return wrap
+
+class LLMMetrics(BaseCallbackHandler):
+    """LLM call latency and token usage (prompt/completion) per model."""
+
+    def __init__(self):
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        t0 = self._started.pop(run_id, None)
+        output = response.llm_output or {}
+        model = output.get("model_name") or "unknown"
+        if t0 is not None:
+            observe("flightai_stage_seconds", time.perf_counter() - t0, stage="llm", op=model)
+        usage = output.get("token_usage") or {}
+        if not usage:
+            # streamed responses carry usage on the message instead
+            for gens in response.generations:
+                for g in gens:
+                    meta = getattr(getattr(g, "message", None), "usage_metadata", None) or {}
+                    usage = {"prompt_tokens": meta.get("input_tokens", 0), "completion_tokens": meta.get("output_tokens", 0)}
+        for kind in ("prompt", "completion"):
+            n = usage.get(f"{kind}_tokens")
+            if n:
+                inc("flightai_llm_tokens_total", n, kind=kind, model=model)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._started.pop(run_id, None)
+        inc("flightai_stage_errors_total", stage="llm", op="call")
+
+llm_metrics = LLMMetrics()
+
+describe("flightai_stage_seconds", "histogram", "Time spent per pipeline stage and operation")
+describe("flightai_stage_errors_total", "counter", "Stage operations that raised")
+describe("flightai_http_request_seconds", "histogram", "HTTP request latency by route")
+describe("flightai_upstream_responses_total", "counter", "Amadeus responses by operation and status code")
+describe("flightai_llm_tokens_total", "counter", "LLM tokens by kind and model")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    items = labels + (extra or ())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def render() -> str:
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    lines: list[str] = []
+    seen: set[str] = set()
+
+    def header(name: str):
+        if name not in seen:
+            seen.add(name)
+            kind, text = _help.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), h in sorted(histograms.items()):
+        header(name)
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h):
+            cumulative += n
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', bound),))} {cumulative}")
+        cumulative += h[len(BUCKETS)]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-1]:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+    for (name, labels), value in sorted(counters.items()):
+        header(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+    for name, fn in _gauges.items():
+        try:
+            values = fn()
+        except Exception:
+            continue
+        header(name)
+        for labels, value in values.items():
+            lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
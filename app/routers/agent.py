@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from app.agent.prefilter import prefilter_stats
+from app.agent.llm_cache import llm_cache
+from app.agent.projection import projection_stats
+
+# The agent itself is mounted by LangServe at /agent; this only adds diagnostics next to it.
+router = APIRouter(prefix="/agent", tags=["agent"])
+
+@router.get("/health")
+async def health():
+    return {"agent": "ready", "prefilter": prefilter_stats(), "llmCache": llm_cache.stats(), "toolTokens": projection_stats()}
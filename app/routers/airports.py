@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.services.airports import airports
+
+router = APIRouter(prefix="/airports", tags=["airports"])
+
+@router.get("/search")
+async def search(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=20)):
+    # autocomplete: IATA code, city or airport name prefix ("lon", "heath", "sao p"); tolerates typos
+    return {"query": q, "results": airports.search(q, limit)}
+
+@router.get("/resolve")
+async def resolve(q: str = Query(..., min_length=1, max_length=100)):
+    place = airports.resolve(q)
+    if place is None:
+        raise HTTPException(status_code=404, detail={"message": f"No single airport or city matches {q!r}",
+                                                     "candidates": airports.search(q, 5)})
+    return place
+
+@router.get("/health")
+async def health():
+    return airports.stats()
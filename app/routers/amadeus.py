@@ -1,95 +1,127 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas import FlightSearchParams, PriceVerifyRequest, CreateOrderRequest, FlightSummary, Money, Leg, Segment
+from typing import AsyncIterator, Literal
+import orjson
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
+from app.schemas import FlightSearchParams, MatrixSearchRequest, PriceVerifyRequest, CreateOrderRequest
+from app.config import settings
 from app.services.amadeus_client import amadeus
+from app.services.flights_service import flights_service, RawMode, MatrixTooLarge, StreamEvent
+from app.services.search_cache import search_cache
+from app.services.offer_store import offer_store, OfferNotFound
+from app.services.idempotency import idempotency, IdempotencyConflict
+from app.services.rate_limiter import rate_limiter, RateLimited
+from app.services.resilience import DeadlineExceeded
+from app.services.prefetch import prefetcher
 
 router = APIRouter(prefix="/amadeus", tags=["amadeus"])
 
-@router.get("/health")
-async def health():
-    return {"amadeus": "ready"}
+def _busy(e: RateLimited) -> HTTPException:
+    # our own limiter said no: the client should back off, it is not an upstream failure
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(int(e.retry_after + 0.5), 1))})
+
+def _timeout(e: DeadlineExceeded) -> HTTPException:
+    return HTTPException(status_code=504, detail=str(e))
+
+StreamFormat = Literal["ndjson", "sse"]
 
-def _normalize_offer(item: dict) -> FlightSummary:
-    # Very light mapping for card display. You can refine later.
-    itineraries = item.get("itineraries", [])
-    def leg(i):
-        if i >= len(itineraries):
-            return None
-        it = itineraries[i]
-        segs = it.get("segments", [])
-        segments = []
-        for s in segs:
-            segments.append(Segment(
-                carrierCode=s.get("carrierCode"),
-                flightNumber=s.get("number"),
-                **{
-                    "from": {"iata": s.get("departure", {}).get("iataCode"), "terminal": s.get("departure", {}).get("terminal")},
-                    "to": {"iata": s.get("arrival", {}).get("iataCode"), "terminal": s.get("arrival", {}).get("terminal")},
-                },
-                depart=s.get("departure", {}).get("at"),
-                arrive=s.get("arrival", {}).get("at"),
-                aircraft=(s.get("aircraft") or {}).get("code"),
-                cabin=(s.get("co2Emissions") or [{}])[0].get("cabin", None)  # placeholder if cabin not present
-            ))
-        return Leg(
-            depart=segs[0].get("departure", {}).get("at") if segs else None,
-            arrive=segs[-1].get("arrival", {}).get("at") if segs else None,
-            duration=it.get("duration"),
-            stops=max(len(segs)-1, 0),
-            segments=segments
-        )
-    total = item.get("price", {}).get("total", "0.00")
-    currency = item.get("price", {}).get("currency", "USD")
-    adults = item.get("travelerPricings", [{}])
-    n_adults = sum(1 for t in adults if t.get("travelerType") == "ADULT") or 1
-    price_per_adult = f"{float(total)/max(n_adults,1):.2f}"
+def _stream(events: AsyncIterator[StreamEvent], fmt: StreamFormat):
+    # ndjson lines are {"event": ..., "data": ...}, mirroring the SSE event/data fields
+    if fmt == "sse":
+        async def sse():
+            async for event, data in events:
+                yield ServerSentEvent(data=orjson.dumps(data).decode(), event=event)
+        return EventSourceResponse(sse())
 
-    return FlightSummary(
-        id=item.get("id", ""),
-        route={"from": item.get("source", None), "to": None},  # we will compute in UI from segments
-        outbound=leg(0),
-        inbound=leg(1),
-        price=Money(amount=str(total), currency=currency),
-        pricePerAdult=Money(amount=str(price_per_adult), currency=currency),
-        validatingAirlines=item.get("validatingAirlineCodes"),
-        baggage=None,
-        raw=item
-    )
+    async def ndjson():
+        async for event, data in events:
+            yield orjson.dumps({"event": event, "data": data}) + b"\n"
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.get("/health")
+async def health():
+    return {
+        "amadeus": "ready",
+        "pool": amadeus.pool_stats(),
+        "token": amadeus.tokens.stats(),
+        "searchCache": search_cache.stats(),
+        "offerStore": offer_store.stats(),
+        "idempotency": idempotency.stats(),
+        "rateLimit": rate_limiter.stats(),
+        "resilience": amadeus.resilience_stats(),
+        "prefetch": prefetcher.stats(),
+    }
 
 @router.post("/search")
-async def search(params: FlightSearchParams):
+async def search(params: FlightSearchParams, raw: RawMode = Query(settings.SEARCH_RAW_MODE)):
+    # raw=full embeds each Amadeus offer, raw=ref only its offer-store reference, raw=none drops it
     try:
-        raw = await amadeus.search_offers(params.dict(exclude_none=True))
-        offers = [_normalize_offer(item) for item in raw.get("data", [])]
-        return {
-            "offers": [o.model_dump(by_alias=True) for o in offers],
-            "meta": {"count": len(offers), "currency": params.currencyCode, "requestId": "na"}
-        }
+        # orjson straight from dicts: skips jsonable_encoder's walk over every offer
+        return ORJSONResponse(await flights_service.search(params, raw))
+    except RateLimited as e:
+        raise _busy(e)
+    except DeadlineExceeded as e:
+        raise _timeout(e)
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
+@router.post("/search/stream")
+async def search_stream(
+    params: FlightSearchParams,
+    raw: RawMode = Query(settings.SEARCH_RAW_MODE),
+    format: StreamFormat = Query("ndjson"),
+):
+    # meta first, then one event per normalized offer, then end
+    try:
+        events = await flights_service.search_stream(params, raw)
+    except RateLimited as e:
+        raise _busy(e)
+    except DeadlineExceeded as e:
+        raise _timeout(e)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return _stream(events, format)
+
+@router.post("/search/matrix")
+async def search_matrix(req: MatrixSearchRequest):
+    # partial results: cells that failed upstream are listed under "errors", not raised
+    try:
+        return ORJSONResponse(await flights_service.search_matrix(req))
+    except MatrixTooLarge as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.post("/search/matrix/stream")
+async def search_matrix_stream(req: MatrixSearchRequest, format: StreamFormat = Query("ndjson")):
+    # one "cell" event per route/date as soon as its search finishes
+    try:
+        return _stream(flights_service.search_matrix_stream(req), format)
+    except MatrixTooLarge as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @router.post("/price")
 async def price(req: PriceVerifyRequest):
-    body = {"data": {"type": "flight-offers-pricing", "flightOffers": [req.offer]}}
     try:
-        res = await amadeus.price_offer(body)
-        # You can map to the priced FlightSummary here if desired
-        return {"pricedOffer": res.get("data"), "raw": res}
+        return await flights_service.price(req)
+    except OfferNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RateLimited as e:
+        raise _busy(e)
+    except DeadlineExceeded as e:
+        raise _timeout(e)
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 @router.post("/create-order")
 async def create_order(req: CreateOrderRequest):
-    body = {"data": {"type": "flight-order", "flightOffers": [req.offer], "travelers": req.travelers}}
     try:
-        res = await amadeus.create_order(body)
-        # Return minimal normalized reservation
-        return {
-            "reservationId": res.get("data", {}).get("id", "resv_simulated"),
-            "status": "simulated",
-            "pnr": None,
-            "offer": None,
-            "travelers": req.travelers,
-            "raw": res
-        }
+        return await flights_service.create_order(req)
+    except OfferNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RateLimited as e:
+        raise _busy(e)
+    except DeadlineExceeded as e:
+        raise _timeout(e)
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
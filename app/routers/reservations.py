@@ -0,0 +1,63 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.config import settings
+from app.services.reservations_service import reservations_service, async_reservations_service
+from app.services.reservation_writer import reservation_writer
+from app.deps import get_db, run_db
+
+router = APIRouter(prefix="/reservations", tags=["reservations"])
+
+service = async_reservations_service if settings.DB_ASYNC else reservations_service
+
+def _iso(dt) -> str:
+    return dt.isoformat() + "Z"
+
+@router.get("/health")
+async def health():
+    return {"reservations": "ready", "writer": reservation_writer.stats()}
+
+@router.get("/list")
+async def list_reservations(
+    page: int = Query(1, ge=1),
+    pageSize: int = Query(20, ge=1, le=100),
+    before: Optional[int] = Query(None, description="meta.nextBefore of the previous page (preferred over page)"),
+    session = Depends(get_db),
+):
+    rows = await run_db(service.list, session, page, pageSize, before)
+    return {
+        "reservations": [
+            {
+                "reservationId": r.reservation_id,
+                "status": r.status,
+                "pnr": r.pnr,
+                "createdAt": _iso(r.created_at),
+            } for r in rows
+        ],
+        "meta": {
+            "page": None if before else page,
+            "pageSize": pageSize,
+            "nextBefore": rows[-1].id if len(rows) == pageSize else None,
+        },
+    }
+
+@router.get("/{reservation_id}")
+async def get_reservation(reservation_id: str, session = Depends(get_db)):
+    r = await run_db(service.get, session, reservation_id)
+    if r is not None:
+        row = {k: getattr(r, k) for k in ("reservation_id", "status", "pnr", "offer", "travelers", "created_at")}
+        persisted = True
+    else:
+        # booked moments ago and still in the write-behind queue
+        row = reservation_writer.pending(reservation_id)
+        persisted = False
+        if row is None:
+            raise HTTPException(status_code=404, detail="Not found")
+    return {
+        "reservationId": row["reservation_id"],
+        "status": row["status"],
+        "pnr": row["pnr"],
+        "offer": row["offer"],
+        "travelers": row["travelers"],
+        "createdAt": _iso(row["created_at"]),
+        "persisted": persisted,
+    }
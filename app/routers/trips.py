@@ -1,38 +1,109 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from app.schemas import SaveTripRequest
-from app.services.trips_service import trips_service
-from app.deps import get_session
+from app.config import settings
+from app.schemas import SaveTripRequest, BulkSaveTripsRequest, BulkDeleteTripsRequest, TripListFilters, TripSort
+from app.services.trips_service import trips_service, async_trips_service, TotalMode
+from app.deps import get_db, run_db
 
 router = APIRouter(prefix="/trips", tags=["trips"])
 
+# DB_ASYNC picks the service once; handlers are async either way and only the sync
+# service is pushed to the threadpool (see deps.run_db).
+service = async_trips_service if settings.DB_ASYNC else trips_service
+
 @router.get("/health")
 async def health():
-    return {"trips": "ready"}
+    return {"trips": "ready", "async": settings.DB_ASYNC}
 
 @router.post("/save", status_code=201)
-def save_trip(req: SaveTripRequest, session = Depends(get_session)):
-    trip = trips_service.save(session, req.offerId, req.offer, req.note)
+async def save_trip(req: SaveTripRequest, session = Depends(get_db)):
+    trip = await run_db(service.save, session, req.offerId, req.offer, req.note)
     return {"tripId": f"trip_{trip.id}", "createdAt": trip.created_at.isoformat() + "Z"}
 
+def _check_batch(n: int):
+    if n > settings.TRIPS_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {settings.TRIPS_BULK_MAX} trips per request")
+
+def _trip_pk(v) -> Optional[int]:
+    s = str(v)
+    s = s[5:] if s.startswith("trip_") else s
+    return int(s) if s.isdigit() else None
+
+@router.post("/bulk-save", status_code=201)
+async def bulk_save_trips(req: BulkSaveTripsRequest, session = Depends(get_db)):
+    _check_batch(len(req.trips))
+    rows = await run_db(service.save_many, session, req.trips)
+    return {
+        "saved": len(rows),
+        "results": [
+            {"index": i, "tripId": f"trip_{trip_id}", "createdAt": created_at.isoformat() + "Z"}
+            for i, (trip_id, created_at) in enumerate(rows)
+        ],
+    }
+
+@router.post("/bulk-delete")
+async def bulk_delete_trips(req: BulkDeleteTripsRequest, session = Depends(get_db)):
+    _check_batch(len(req.tripIds))
+    pks = [_trip_pk(v) for v in req.tripIds]
+    deleted = await run_db(service.delete_many, session, [pk for pk in pks if pk is not None])
+    results = []
+    for v, pk in zip(req.tripIds, pks):
+        if pk is None:
+            results.append({"tripId": v, "ok": False, "error": "invalid id"})
+        elif pk in deleted:
+            results.append({"tripId": f"trip_{pk}", "ok": True})
+        else:
+            results.append({"tripId": f"trip_{pk}", "ok": False, "error": "not found"})
+    return {"deleted": len(deleted), "results": results}
+
+def _summary(r) -> dict | None:
+    if r.origin is None and r.price_amount is None:
+        return None
+    return {
+        "route": {"from": r.origin, "to": r.destination},
+        "depart": r.depart_date.isoformat() if r.depart_date else None,
+        "return": r.return_date.isoformat() if r.return_date else None,
+        "stops": r.stops,
+        "price": {"amount": f"{r.price_amount:.2f}", "currency": r.currency} if r.price_amount is not None else None,
+        "carrier": r.carrier,
+    }
+
 @router.get("/list")
-def list_trips(page: int = Query(1, ge=1), pageSize: int = Query(20, ge=1, le=100), session = Depends(get_session)):
-    rows = trips_service.list(session, page, pageSize)
+async def list_trips(
+    page: int = Query(1, ge=1),
+    pageSize: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="meta.nextCursor of the previous page (preferred over page)"),
+    total: TotalMode = Query(settings.TRIPS_LIST_TOTAL),
+    sort: TripSort = Query("-created"),
+    filters: TripListFilters = Depends(),
+    session = Depends(get_db),
+):
+    try:
+        rows, next_cursor = await run_db(service.list, session, page, pageSize, cursor, filters, sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "trips": [
             {
                 "tripId": f"trip_{r.id}",
                 "offerId": r.offer_id,
-                "summary": None,
+                "summary": _summary(r),
                 "note": r.note,
                 "createdAt": r.created_at.isoformat() + "Z"
             } for r in rows
         ],
-        "meta": {"page": page, "pageSize": pageSize, "total": len(rows)}
+        "meta": {
+            "page": None if cursor else page,
+            "pageSize": pageSize,
+            "total": await run_db(service.count, session, total, filters, sort),
+            "totalMode": total,
+            "nextCursor": next_cursor,
+        }
     }
 
 @router.delete("/{trip_id}")
-def delete_trip(trip_id: int, session = Depends(get_session)):
-    ok = trips_service.delete(session, trip_id)
+async def delete_trip(trip_id: int, session = Depends(get_db)):
+    ok = await run_db(service.delete, session, trip_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Not found")
     return {"ok": True}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Any, Literal
+from datetime import date
 
 class FlightSearchParams(BaseModel):
     originLocationCode: str
@@ -14,6 +15,27 @@ class FlightSearchParams(BaseModel):
     nonStop: Optional[bool] = False
     max: Optional[int] = 20
 
+class MatrixSearchRequest(BaseModel):
+    # Every origin x destination x departure date in [departFrom, departTo] is one search
+    origins: List[str] = Field(..., min_length=1)
+    destinations: List[str] = Field(..., min_length=1)
+    departFrom: date
+    departTo: Optional[date] = None  # defaults to departFrom
+    stayDays: Optional[int] = Field(None, ge=0, description="round trip: return this many days after departure")
+    adults: int = 1
+    children: Optional[int] = 0
+    infants: Optional[int] = 0
+    travelClass: Optional[str] = None
+    currencyCode: Optional[str] = "USD"
+    nonStop: Optional[bool] = False
+    max: Optional[int] = 10  # offers fetched per cell
+
+    @model_validator(mode="after")
+    def _range(self):
+        if self.departTo is not None and self.departTo < self.departFrom:
+            raise ValueError("departTo is before departFrom")
+        return self
+
 class Money(BaseModel):
     amount: str
     currency: str
@@ -46,11 +68,23 @@ class FlightSummary(BaseModel):
     baggage: Optional[dict] = None
     raw: Any
 
-class PriceVerifyRequest(BaseModel):
-    offer: Any
+class OfferRef(BaseModel):
+    # Either the raw offer, or a reference to one stored by /amadeus/search:
+    # offerId + searchId, or offerId as "searchId:offerId".
+    offer: Any = None
+    offerId: Optional[str] = None
+    searchId: Optional[str] = None
 
-class CreateOrderRequest(BaseModel):
-    offer: Any
+    @model_validator(mode="after")
+    def _offer_or_ref(self):
+        if not (self.offer or self.offerId):
+            raise ValueError("Provide either offer or offerId")
+        return self
+
+class PriceVerifyRequest(OfferRef):
+    pass
+
+class CreateOrderRequest(OfferRef):
     travelers: List[Any]
     testMode: Optional[bool] = True
     idempotencyKey: Optional[str] = None
@@ -59,3 +93,22 @@ class SaveTripRequest(BaseModel):
     offerId: str
     offer: Any
     note: Optional[str] = None
+
+class BulkSaveTripsRequest(BaseModel):
+    trips: List[SaveTripRequest]
+
+class BulkDeleteTripsRequest(BaseModel):
+    # 123 or "trip_123", as returned by /trips/save
+    tripIds: List[int | str]
+
+class TripListFilters(BaseModel):
+    # Query filters for /trips/list, applied in the database on the summary columns
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    departFrom: Optional[date] = None
+    departTo: Optional[date] = None
+    maxPrice: Optional[float] = None
+    maxStops: Optional[int] = None
+    carrier: Optional[str] = None
+
+TripSort = Literal["-created", "price", "depart"]
@@ -0,0 +1,240 @@
+import bisect, difflib, heapq, re, time, unicodedata
+from array import array
+from pathlib import Path
+from typing import Optional
+from app.metrics import span
+
+DATA = Path(__file__).resolve().parent.parent / "data" / "airports.tsv"
+
+# key weights: what part of a place a search key came from
+CODE, CITY, NAME = 3, 2, 1
+# name words that say nothing about which airport is meant
+_FILLER = frozenset({"airport", "international", "intl", "regional", "municipal", "domestic", "airfield",
+                     "field", "air", "base", "aerodrome", "county", "the", "and", "of", "de", "del", "la"})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_IATA = re.compile(r"[A-Z]{3}")
+
+class UnknownLocation(LookupError):
+    """No single airport or city matches; `candidates` are the closest autocomplete hits."""
+
+    def __init__(self, text: str, candidates: list[dict]):
+        super().__init__(f"No single airport or city matches {text!r}")
+        self.candidates = candidates
+
+def normalize(text: str) -> str:
+    """Casefolded, accent-free, punctuation-free form used for every key ("São Paulo" -> "sao paulo")."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", text.casefold()).strip()
+
+class AirportIndex:
+    """Offline airport/city index (app/data/airports.tsv) for autocomplete and IATA resolution.
+
+    Every place contributes sorted keys (code, city, full name, name words) held in one
+    sorted list with parallel `array`s of row ids and key weights, so a prefix lookup is
+    a bisect plus a short scan. Candidates sharing a name are ordered by the bundled
+    rank: metro codes (LON, NYC), then primary airports (DOH over DIA), then the rest.
+    Loaded at startup (off the event loop) or on first use, in ~0.15 s.
+    """
+
+    def __init__(self, path: Path = DATA, fuzzy_cutoff: float = 0.8):
+        self.path = path
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.loaded = False
+        self.load_ms = 0.0
+        self.lookups = 0
+        self.fuzzy_hits = 0
+
+    def load(self):
+        if self.loaded:
+            return
+        t0 = time.perf_counter()
+        codes, kinds, names, cities, regions, countries, metros = [], [], [], [], [], [], []
+        ranks = array("i")
+        entries: list[tuple[str, int, int]] = []
+        by_code: dict[str, int] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                code, kind, name, city, region, country, metro, rank = line.rstrip("\n").split("\t")
+                row = len(codes)
+                codes.append(code)
+                kinds.append("city" if kind == "C" else "airport")
+                names.append(name)
+                cities.append(city)
+                regions.append(region)
+                countries.append(country)
+                metros.append(metro or None)
+                ranks.append(int(rank))
+                # an airport sharing its metro's code (DXB) is what the code means
+                if kind == "A" or code not in by_code:
+                    by_code[code] = row
+                entries.append((code.lower(), row, CODE))
+                seen = set()
+                # "Arnavutköy, Istanbul" is found as either part
+                for part in [city, *city.split(",")[1:]]:
+                    part = normalize(part)
+                    if part and part not in seen:
+                        seen.add(part)
+                        entries.append((part, row, CITY))
+                full = normalize(name)
+                if full and full not in seen:
+                    seen.add(full)
+                    entries.append((full, row, NAME))
+                # later words of the name ("heathrow", "hamad"), each as its own prefix
+                words = full.split()
+                for i in range(1, len(words)):
+                    if words[i] not in _FILLER and len(words[i]) > 2:
+                        tail = " ".join(words[i:])
+                        if tail not in seen:
+                            seen.add(tail)
+                            entries.append((tail, row, NAME))
+        entries.sort()
+        self._keys = [key for key, _, _ in entries]
+        self._rows = array("I", (row for _, row, _ in entries))
+        self._weights = array("B", (weight for _, _, weight in entries))
+        # city names by first letter, for typo matching
+        buckets: dict[str, set] = {}
+        for key, _, weight in entries:
+            if weight == CITY:
+                buckets.setdefault(key[0], set()).add(key)
+        self._fuzzy = {c: sorted(keys) for c, keys in buckets.items()}
+        self._codes, self._kinds, self._names, self._cities = codes, kinds, names, cities
+        self._regions, self._countries, self._metros, self._ranks = regions, countries, metros, ranks
+        self._by_code = by_code
+        self._short: dict[tuple[str, int], list[dict]] = {}
+        self.loaded = True
+        self.load_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    def _place(self, row: int, match: Optional[str] = None) -> dict:
+        place = {
+            "code": self._codes[row],
+            "type": self._kinds[row],
+            "name": self._names[row],
+            "city": self._cities[row],
+            "region": self._regions[row] or None,
+            "country": self._countries[row],
+            "metro": self._metros[row],
+        }
+        if match:
+            place["match"] = match
+        return place
+
+    def _scan(self, prefix: str) -> dict[int, tuple]:
+        """row -> best (exact key, weight, rank) over keys starting with `prefix`."""
+        keys, rows, weights, ranks = self._keys, self._rows, self._weights, self._ranks
+        best: dict[int, tuple] = {}
+        i = bisect.bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            row = rows[i]
+            score = (keys[i] == prefix, weights[i], ranks[row])
+            if score > best.get(row, (False, 0, 0)):
+                best[row] = score
+            i += 1
+        return best
+
+    def _exact(self, key: str) -> dict[int, tuple]:
+        keys, rows, weights, ranks = self._keys, self._rows, self._weights, self._ranks
+        best: dict[int, tuple] = {}
+        i = bisect.bisect_left(keys, key)
+        while i < len(keys) and keys[i] == key:
+            row = rows[i]
+            best[row] = max(best.get(row, (0, 0)), (weights[i], ranks[row]))
+            i += 1
+        return best
+
+    def _close(self, key: str, n: int) -> list[str]:
+        if len(key) < 4:
+            return []
+        return difflib.get_close_matches(key, self._fuzzy.get(key[0], ()), n=n, cutoff=self.fuzzy_cutoff)
+
+    def search(self, q: str, limit: int = 10) -> list[dict]:
+        """Autocomplete: places whose code, city or name starts with `q`, best first (typo-tolerant)."""
+        self.load()
+        with span("airports", "search"):
+            prefix = normalize(q)
+            if not prefix:
+                return []
+            # one- and two-letter prefixes scan thousands of keys; there are few enough to memoize
+            short = len(prefix) <= 2
+            if short and (prefix, limit) in self._short:
+                return self._short[prefix, limit]
+            best = self._scan(prefix)
+            if best:
+                ranked, match = heapq.nlargest(limit * 2, best.items(), key=lambda kv: kv[1]), None
+            else:
+                ranked, match = [], "fuzzy"
+                for key in self._close(prefix, limit):
+                    ranked += sorted(self._exact(key).items(), key=lambda kv: kv[1], reverse=True)
+            out, codes = [], set()
+            for row, _ in ranked:
+                # DXB is both Dubai's metro code and its main airport: list the code once
+                if self._codes[row] not in codes and len(out) < limit:
+                    codes.add(self._codes[row])
+                    out.append(self._place(row, match))
+            if short:
+                self._short[prefix, limit] = out
+            return out
+
+    def resolve(self, text: str, codes: bool = True, fuzzy: bool = True) -> Optional[dict]:
+        """The one place `text` names (code, city, airport name, or a close misspelling), or None.
+
+        None also when the best candidates tie (Hamilton: YHM / HLZ / BDA): callers should ask
+        rather than guess. City names with a metro code resolve to it (London -> LON).
+        """
+        self.load()
+        self.lookups += 1
+        key = normalize(text)
+        if not key:
+            return None
+        if codes and len(key) == 3 and key.upper() in self._by_code:
+            return self._place(self._by_code[key.upper()], "code")
+        exact = self._exact(key)
+        if exact:
+            return self._pick(exact, "exact")
+        # "frankfurt" / "london heathrow" / "queen alia": the start of a city or airport name, up to a word break
+        named = self._scan(key + " ")
+        if named:
+            return self._pick({row: score[1:] for row, score in named.items()}, "name")
+        if not fuzzy:
+            return None
+        for close in self._close(key, 1):
+            hit = self._pick(self._exact(close), "fuzzy")
+            if hit is not None:
+                self.fuzzy_hits += 1
+            return hit
+        return None
+
+    def code_for(self, text: str) -> str:
+        """IATA code for a code or a place name ("Amman" -> "AMM"); raises UnknownLocation."""
+        text = text.strip()
+        # upper-case codes pass through untouched, even ones missing from the bundled data
+        if _IATA.fullmatch(text):
+            return text
+        place = self.resolve(text)
+        if place is None:
+            raise UnknownLocation(text, self.search(text, 5))
+        return place["code"]
+
+    def _pick(self, best: dict[int, tuple], match: str) -> Optional[dict]:
+        if not best:
+            return None
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)
+        row, score = ranked[0]
+        if len(ranked) > 1 and ranked[1][1] == score and self._codes[ranked[1][0]] != self._codes[row]:
+            return None
+        return self._place(row, match)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "places": len(self._codes) if self.loaded else 0,
+            "keys": len(self._keys) if self.loaded else 0,
+            "loadMs": self.load_ms,
+            "resolves": self.lookups,
+            "fuzzyResolves": self.fuzzy_hits,
+        }
+
+airports = AirportIndex()
@@ -1,68 +1,252 @@
-import time, httpx
+import asyncio, logging, time, httpx
+from typing import Optional
 from tenacity import retry, wait_exponential, stop_after_attempt
 from app.config import settings
+from app.services.token_manager import TOKEN_FETCH_ATTEMPTS, TOKEN_FETCH_WAIT, TokenManager
+from app.services.rate_limiter import rate_limiter, Priority, RateLimited, parse_retry_after
+from app.services.resilience import DeadlineExceeded, LatencyWindow, backoff, breaker, remaining
+from app.metrics import inc, span
+
+log = logging.getLogger(__name__)
 
 class AmadeusClient:
     def __init__(self):
-        self._token = None
-        self._exp = 0
+        self.tokens = TokenManager(
+            self._fetch_token,
+            margin=settings.AMADEUS_TOKEN_REFRESH_MARGIN,
+            shared=settings.AMADEUS_TOKEN_SHARED,
+        )
+        # One long-lived pool for every Amadeus call; see start()/close().
+        self._client: httpx.AsyncClient | None = None
+        self._requests = 0
+        self._in_flight = 0
+        self._latency: dict[str, LatencyWindow] = {}
+        self._hedge_budget = 0.0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
 
-    @retry(wait=wait_exponential(min=1, max=8), stop=stop_after_attempt(3))
-    async def _get_token(self) -> str:
-        if self._token and time.time() < self._exp - 30:
-            return self._token
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                f"{settings.AMADEUS_BASE_URL}/v1/security/oauth2/token",
-                data={
-                    "grant_type": "client_credentials",
-                    "client_id": settings.AMADEUS_API_KEY,
-                    "client_secret": settings.AMADEUS_API_SECRET,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-                timeout=30.0,
-            )
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = settings.AMADEUS_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                log.warning("AMADEUS_HTTP2 is set but 'h2' is not installed; using HTTP/1.1")
+                http2 = False
+        return httpx.AsyncClient(
+            base_url=settings.AMADEUS_BASE_URL,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.AMADEUS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AMADEUS_MAX_KEEPALIVE,
+                keepalive_expiry=settings.AMADEUS_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.AMADEUS_SEARCH_TIMEOUT, connect=settings.AMADEUS_CONNECT_TIMEOUT),
+        )
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._build_client()
+        self.tokens.start()
+
+    async def close(self):
+        await self.tokens.stop()
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Lazily opened so scripts/tools that never run the FastAPI lifespan still work.
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def pool_stats(self) -> dict:
+        stats = {
+            "open": self._client is not None,
+            "http2": False,
+            "maxConnections": settings.AMADEUS_MAX_CONNECTIONS,
+            "maxKeepalive": settings.AMADEUS_MAX_KEEPALIVE,
+            "requests": self._requests,
+            "inFlight": self._in_flight,
+            "connections": 0,
+            "idle": 0,
+        }
+        if self._client is None:
+            return stats
+        # httpcore does not expose pool stats publicly; read them defensively.
+        pool = getattr(self._client._transport, "_pool", None)
+        conns = list(getattr(pool, "connections", []) or [])
+        stats["http2"] = bool(getattr(pool, "_http2", False))
+        stats["connections"] = len(conns)
+        stats["idle"] = sum(1 for c in conns if c.is_idle())
+        return stats
+
+    def _timeout(self, seconds: float) -> httpx.Timeout:
+        return httpx.Timeout(seconds, connect=settings.AMADEUS_CONNECT_TIMEOUT)
+
+    async def _send(self, method: str, path: str, *, op: str, timeout: float, priority: Priority,
+                    bounded: bool = True, max_wait: Optional[float] = None, **kwargs) -> httpx.Response:
+        """One upstream call: a rate-limiter slot, then the request, sized to the request deadline."""
+        wait = remaining(settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait)
+        await rate_limiter.acquire(priority, wait)
+        budget = remaining(timeout)
+        if not bounded:
+            budget = timeout
+        headers = await self._headers()
+        self._requests += 1
+        self._in_flight += 1
+        t0 = time.perf_counter()
+        try:
+            # httpx timeouts are per read; the deadline bounds the whole exchange
+            with span("amadeus", op):
+                async with asyncio.timeout(budget if budget < timeout else None):
+                    r = await self.client.request(method, path, headers=headers, timeout=self._timeout(budget), **kwargs)
+        except (TimeoutError, httpx.TimeoutException) as e:
+            inc("flightai_upstream_responses_total", op=op, status=type(e).__name__)
+            if budget < timeout:
+                # our caller's deadline, not a slow upstream: nothing for the breaker to learn
+                raise DeadlineExceeded(f"request deadline exceeded waiting for Amadeus {op}") from e
+            raise
+        except httpx.RequestError as e:
+            inc("flightai_upstream_responses_total", op=op, status=type(e).__name__)
+            raise
+        finally:
+            self._in_flight -= 1
+        inc("flightai_upstream_responses_total", op=op, status=r.status_code)
+        if r.status_code < 500 and r.status_code != 429:
+            self._latency.setdefault(op, LatencyWindow()).add(time.perf_counter() - t0)
+        return r
+
+    async def _hedged(self, method: str, path: str, *, op: str, **kwargs) -> httpx.Response:
+        """`_send`, plus a duplicate if the first is slower than the recent p95; the first good answer wins."""
+        window = self._latency.get(op)
+        q = window.quantile(settings.AMADEUS_HEDGE_QUANTILE) if window is not None else None
+        self._hedge_budget = min(self._hedge_budget + settings.AMADEUS_HEDGE_MAX_RATIO, 10.0)
+        first = asyncio.ensure_future(self._send(method, path, op=op, **kwargs))
+        pending = {first}
+        try:
+            if q is None:
+                return await first
+            done, _ = await asyncio.wait(pending, timeout=max(q, settings.AMADEUS_HEDGE_MIN_DELAY))
+            if done or self._hedge_budget < 1:
+                return await first
+            self._hedge_budget -= 1
+            self.hedges += 1
+            # the duplicate only runs if a rate-limit token is free right now
+            second = asyncio.ensure_future(self._send(method, path, op=op, **{**kwargs, "max_wait": 0}))
+            pending.add(second)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None and t.result().status_code < 500 and t.result().status_code != 429:
+                        if t is second:
+                            self.hedge_wins += 1
+                        return t.result()
+            return first.result()
+        finally:
+            for t in pending:
+                t.cancel()
+
+    async def _request(self, method: str, path: str, *, op: str, timeout: float, priority: Priority,
+                       safe: bool = False, hedge: bool = False, bounded: bool = True, **kwargs) -> dict:
+        """Call Amadeus through the circuit breaker and rate limiter.
+
+        429s feed back into the limiter and are retried; for `safe` operations 5xx and
+        network errors are retried too, with full-jitter backoff inside the deadline.
+        `hedge` sends a duplicate of a slow call (idempotent searches only). With
+        `bounded=False` an in-flight call keeps its full timeout past the request deadline.
+        """
+        send = self._hedged if hedge and settings.AMADEUS_HEDGE_ENABLED else self._send
+        retries = settings.AMADEUS_RETRIES if safe else 0
+        attempt = throttled = 0
+        while True:
+            breaker.check()
+            try:
+                r = await send(method, path, op=op, timeout=timeout, priority=priority, bounded=bounded, **kwargs)
+            except httpx.TransportError:
+                breaker.record(False)
+                delay = backoff(attempt) if attempt < retries else None
+                if delay is None:
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            if r.status_code == 429:
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                await rate_limiter.on_throttled(retry_after)
+                if throttled < settings.RATE_LIMIT_429_RETRIES:
+                    throttled += 1
+                    continue
+                # still throttled: fail like our own limiter (503 + Retry-After, stale-cache fallback)
+                raise RateLimited(f"Amadeus is throttling {op} (429)", retry_after if retry_after is not None else 1.0)
+            rate_limiter.on_success()
+            breaker.record(r.status_code < 500)
+            if r.status_code >= 500 and attempt < retries:
+                delay = backoff(attempt)
+                if delay is not None:
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+            break
+        r.raise_for_status()
+        return r.json()
+
+    def resilience_stats(self) -> dict:
+        return {
+            "breaker": breaker.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedgeWins": self.hedge_wins,
+            "hedgeDelay": {op: w.quantile(settings.AMADEUS_HEDGE_QUANTILE) for op, w in self._latency.items()},
+        }
+
+    @retry(wait=wait_exponential(min=TOKEN_FETCH_WAIT[0], max=TOKEN_FETCH_WAIT[1]), stop=stop_after_attempt(TOKEN_FETCH_ATTEMPTS))
+    async def _fetch_token(self) -> dict:
+        r = await self.client.post(
+            "/v1/security/oauth2/token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": settings.AMADEUS_API_KEY,
+                "client_secret": settings.AMADEUS_API_SECRET,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=self._timeout(settings.AMADEUS_TOKEN_TIMEOUT),
+        )
         r.raise_for_status()
-        data = r.json()
-        self._token = data["access_token"]
-        self._exp = time.time() + int(data["expires_in"])
-        return self._token
+        return r.json()
+
+    async def _get_token(self) -> str:
+        return await self.tokens.get()
 
     async def _headers(self):
         token = await self._get_token()
         return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
-    async def search_offers(self, params: dict):
-        async with httpx.AsyncClient() as client:
-            r = await client.get(
-                f"{settings.AMADEUS_BASE_URL}/v2/shopping/flight-offers",
-                params=params,
-                headers=await self._headers(),
-                timeout=30.0,
-            )
-        r.raise_for_status()
-        return r.json()
+    async def search_offers(self, params: dict, priority: Priority = Priority.SEARCH):
+        return await self._request(
+            "GET", "/v2/shopping/flight-offers", op="search_offers",
+            params=params, timeout=settings.AMADEUS_SEARCH_TIMEOUT, priority=priority, safe=True,
+            # a background prefetch has nobody waiting on it: no duplicate calls
+            hedge=priority != Priority.PREFETCH,
+        )
 
     async def price_offer(self, body: dict):
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                f"{settings.AMADEUS_BASE_URL}/v1/shopping/flight-offers/pricing",
-                json=body,
-                headers=await self._headers(),
-                timeout=30.0,
-            )
-        r.raise_for_status()
-        return r.json()
+        return await self._request(
+            "POST", "/v1/shopping/flight-offers/pricing", op="price_offer",
+            json=body, timeout=settings.AMADEUS_PRICE_TIMEOUT, priority=Priority.PRICING, safe=True,
+        )
 
     async def create_order(self, body: dict):
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                f"{settings.AMADEUS_BASE_URL}/v1/booking/flight-orders",
-                json=body,
-                headers=await self._headers(),
-                timeout=30.0,
-            )
-        r.raise_for_status()
-        return r.json()
+        return await self._request(
+            "POST", "/v1/booking/flight-orders", op="create_order",
+            json=body, timeout=settings.AMADEUS_ORDER_TIMEOUT, priority=Priority.BOOKING,
+            # a booking already sent is not abandoned at the deadline: it may have gone through
+            bounded=False,
+        )
 
 amadeus = AmadeusClient()
@@ -0,0 +1,53 @@
+import asyncio, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+class LocalTTLCache:
+    """Small in-process LRU with per-entry TTL (the fallback tier when Redis is absent)."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any | None:
+        item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key onto one awaitable."""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Return `(result, shared)`; `shared` is True when another caller did the work."""
+        fut = self._calls.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut), True
+        fut = asyncio.ensure_future(fn())
+        self._calls[key] = fut
+        fut.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(fut), False
@@ -0,0 +1,308 @@
+import asyncio, itertools, time, uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Literal, Optional
+import httpx
+from app.config import settings
+from app.schemas import FlightSearchParams, MatrixSearchRequest, PriceVerifyRequest, CreateOrderRequest
+from app.services.amadeus_client import amadeus
+from app.services.search_cache import search_cache, canonical_params
+from app.services.offer_store import offer_store
+from app.services.reservation_writer import reservation_writer
+from app.services.idempotency import idempotency, fingerprint
+from app.services.rate_limiter import RateLimited
+from app.services.prefetch import prefetcher
+from app.metrics import span
+
+# Offers are built as plain dicts in one pass, shaped exactly like
+# FlightSummary.model_dump(by_alias=True); validating every segment through pydantic
+# and dumping it again dominated /search CPU time for large `max` values.
+
+RawMode = Literal["full", "none", "ref"]
+# (event, payload) pairs for the streaming endpoints: "meta", then "offer"/"cell" items, then "end"
+StreamEvent = tuple[str, dict]
+
+def _segment(s: dict) -> dict:
+    dep = s.get("departure") or {}
+    arr = s.get("arrival") or {}
+    return {
+        "carrierCode": s.get("carrierCode"),
+        "flightNumber": s.get("number"),
+        "from": {"iata": dep.get("iataCode"), "terminal": dep.get("terminal")},
+        "to": {"iata": arr.get("iataCode"), "terminal": arr.get("terminal")},
+        "depart": dep.get("at"),
+        "arrive": arr.get("at"),
+        "aircraft": (s.get("aircraft") or {}).get("code"),
+        "cabin": (s.get("co2Emissions") or [{}])[0].get("cabin"),  # placeholder if cabin not present
+    }
+
+def _leg(it: dict) -> dict:
+    segments = [_segment(s) for s in it.get("segments") or ()]
+    return {
+        "depart": segments[0]["depart"] if segments else None,
+        "arrive": segments[-1]["arrive"] if segments else None,
+        "duration": it.get("duration"),
+        "stops": max(len(segments) - 1, 0),
+        "segments": segments,
+    }
+
+def normalize_offer(item: dict, raw: RawMode = "full", search_id: Optional[str] = None) -> dict:
+    """Map one Amadeus offer to the card shape.
+
+    `raw` controls the embedded Amadeus offer: "full" (as-is), "none", or "ref"
+    ({"searchId", "offerId"} pointing into the offer store).
+    """
+    itineraries = item.get("itineraries") or ()
+    price = item.get("price") or {}
+    total = price.get("total", "0.00")
+    currency = price.get("currency", "USD")
+    travelers = item.get("travelerPricings") or ()
+    n_adults = sum(1 for t in travelers if t.get("travelerType") == "ADULT") or 1
+    offer_id = item.get("id", "")
+    if raw == "full":
+        raw_value = item
+    elif raw == "ref":
+        raw_value = {"searchId": search_id, "offerId": offer_id}
+    else:
+        raw_value = None
+    return {
+        "id": offer_id,
+        "route": {"from": item.get("source"), "to": None},  # we will compute in UI from segments
+        "outbound": _leg(itineraries[0]) if len(itineraries) > 0 else None,
+        "inbound": _leg(itineraries[1]) if len(itineraries) > 1 else None,
+        "price": {"amount": str(total), "currency": currency},
+        "pricePerAdult": {"amount": f"{float(total)/n_adults:.2f}", "currency": currency},
+        "validatingAirlines": item.get("validatingAirlineCodes"),
+        "baggage": None,
+        "raw": raw_value,
+    }
+
+class MatrixTooLarge(ValueError):
+    pass
+
+def matrix_cells(req: MatrixSearchRequest) -> list[FlightSearchParams]:
+    """One search per origin x destination x departure day (same-airport pairs skipped)."""
+    # normalize before de-duplicating ("amm" and "AMM" are one origin), and size the
+    # matrix before building it: departTo=2999-12-31 must not materialize every day
+    origins = dict.fromkeys(o.strip().upper() for o in req.origins)
+    destinations = dict.fromkeys(d.strip().upper() for d in req.destinations)
+    n_days = ((req.departTo or req.departFrom) - req.departFrom).days + 1
+    n = (len(origins) * len(destinations) - len(origins.keys() & destinations.keys())) * n_days
+    if n > settings.MATRIX_MAX_CELLS:
+        raise MatrixTooLarge(f"{n} searches requested; at most {settings.MATRIX_MAX_CELLS} per matrix")
+    days = [req.departFrom + timedelta(days=i) for i in range(n_days)]
+    pairs = [(o, d) for o, d in itertools.product(origins, destinations) if o != d]
+    common = req.model_dump(include={"adults", "children", "infants", "travelClass", "currencyCode", "nonStop", "max"})
+    return [
+        FlightSearchParams(
+            originLocationCode=o, destinationLocationCode=d, departureDate=day.isoformat(),
+            returnDate=(day + timedelta(days=req.stayDays)).isoformat() if req.stayDays is not None else None,
+            **common,
+        )
+        for (o, d), day in itertools.product(pairs, days)
+    ]
+
+def _cheapest(data: list[dict]) -> Optional[dict]:
+    best = None
+    for item in data:
+        try:
+            total = float((item.get("price") or {}).get("total"))
+        except (TypeError, ValueError):
+            continue
+        if best is None or total < best[0]:
+            best = (total, item)
+    return best[1] if best else None
+
+async def _store_offers(res: dict) -> str:
+    """Keep the raw offers server-side so price/create-order can reference them by id.
+
+    A search-cache fill carries its own searchId: its offers are stored on the first hit
+    (or again once they expired from the offer store), not compressed on every hit.
+    """
+    data = res.get("data", [])
+    search_id = res.get("searchId")
+    if search_id is None:
+        return await offer_store.put(data)
+    if not await offer_store.has(search_id, data):
+        await offer_store.put(data, search_id)
+    return search_id
+
+class FlightsService:
+    """Amadeus-backed flight operations shared by the HTTP routers and the agent tools."""
+
+    async def search(self, params: FlightSearchParams, raw: RawMode = "full") -> dict:
+        query = canonical_params(params)
+        prefetcher.record(query)
+        res = await search_cache.get_or_fetch(query, amadeus.search_offers)
+        data = res.get("data", [])
+        search_id = await _store_offers(res)
+        with span("normalize", "search"):
+            offers = [normalize_offer(item, raw, search_id) for item in data]
+        return {
+            "offers": offers,
+            "meta": {"count": len(offers), "currency": params.currencyCode, "requestId": "na", "searchId": search_id}
+        }
+
+    async def search_stream(self, params: FlightSearchParams, raw: RawMode = "full") -> AsyncIterator[StreamEvent]:
+        """Like `search`, but offers are normalized one at a time as the consumer pulls them.
+
+        The upstream call and offer-store write happen before this returns, so failures
+        surface as errors instead of a truncated stream.
+        """
+        query = canonical_params(params)
+        prefetcher.record(query)
+        res = await search_cache.get_or_fetch(query, amadeus.search_offers)
+        data = res.get("data", [])
+        search_id = await _store_offers(res)
+
+        async def events():
+            yield "meta", {"count": len(data), "currency": params.currencyCode, "requestId": "na", "searchId": search_id}
+            for item in data:
+                yield "offer", normalize_offer(item, raw, search_id)
+            yield "end", {"count": len(data)}
+        return events()
+
+    async def _matrix_cell(self, params: FlightSearchParams, sem: asyncio.Semaphore) -> dict:
+        cell = {
+            "origin": params.originLocationCode,
+            "destination": params.destinationLocationCode,
+            "departureDate": params.departureDate,
+            "returnDate": params.returnDate,
+        }
+        async with sem:
+            try:
+                # the deadline only abandons the wait: the shared cache fill keeps running
+                res = await asyncio.wait_for(
+                    search_cache.get_or_fetch(params, amadeus.search_offers), settings.MATRIX_CELL_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                return {**cell, "status": "error", "error": "TIMEOUT"}
+            except RateLimited:
+                return {**cell, "status": "error", "error": "RATE_LIMITED"}
+            except httpx.HTTPStatusError as e:
+                return {**cell, "status": "error", "error": f"HTTP_{e.response.status_code}"}
+            except Exception as e:
+                return {**cell, "status": "error", "error": type(e).__name__, "detail": str(e)}
+        data = res.get("data", [])
+        best = _cheapest(data)
+        if best is None:
+            return {**cell, "status": "empty", "offers": 0}
+        search_id = await _store_offers(res)
+        return {
+            **cell,
+            "status": "ok",
+            "offers": len(data),
+            "searchId": search_id,
+            "cheapest": normalize_offer(best, "none", search_id),
+        }
+
+    async def _iter_matrix(self, cells: list[FlightSearchParams]) -> AsyncIterator[dict]:
+        """Cell results in completion order; abandoning the iterator cancels pending cells."""
+        sem = asyncio.Semaphore(settings.MATRIX_CONCURRENCY)
+        tasks = [asyncio.ensure_future(self._matrix_cell(p, sem)) for p in cells]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def search_matrix(self, req: MatrixSearchRequest) -> dict:
+        """Fan one request out to every route/date combination and rank the cheapest per cell.
+
+        At most MATRIX_CONCURRENCY searches run at once, each bounded by MATRIX_CELL_TIMEOUT
+        and served from the search cache when possible. Failed cells are reported next
+        to the successful ones instead of failing the whole matrix.
+        """
+        started = time.perf_counter()
+        cells = [c async for c in self._iter_matrix(matrix_cells(req))]
+        cells.sort(key=lambda c: (c["origin"], c["destination"], c["departureDate"]))
+        ok = sorted(
+            (c for c in cells if c["status"] == "ok"),
+            key=lambda c: float(c["cheapest"]["price"]["amount"]),
+        )
+        matrix: dict[str, dict[str, Optional[str]]] = {}
+        for c in cells:
+            route = f'{c["origin"]}-{c["destination"]}'
+            matrix.setdefault(route, {})[c["departureDate"]] = c["cheapest"]["price"]["amount"] if c["status"] == "ok" else None
+        return {
+            "cells": ok,
+            "matrix": matrix,
+            "empty": [c for c in cells if c["status"] == "empty"],
+            "errors": [c for c in cells if c["status"] == "error"],
+            "meta": {
+                "searches": len(cells),
+                "ok": len(ok),
+                "failed": sum(c["status"] == "error" for c in cells),
+                "currency": req.currencyCode,
+                "elapsedMs": round((time.perf_counter() - started) * 1000),
+            },
+        }
+
+    def search_matrix_stream(self, req: MatrixSearchRequest) -> AsyncIterator[StreamEvent]:
+        """Matrix cells streamed as each search finishes (MatrixTooLarge is raised up front)."""
+        cells = matrix_cells(req)
+
+        async def events():
+            started = time.perf_counter()
+            yield "meta", {"searches": len(cells), "currency": req.currencyCode}
+            counts = {"ok": 0, "empty": 0, "error": 0}
+            async for cell in self._iter_matrix(cells):
+                counts[cell["status"]] += 1
+                yield "cell", cell
+            yield "end", {
+                "searches": len(cells),
+                "ok": counts["ok"],
+                "failed": counts["error"],
+                "elapsedMs": round((time.perf_counter() - started) * 1000),
+            }
+        return events()
+
+    async def price(self, req: PriceVerifyRequest) -> dict:
+        offer = await offer_store.resolve(req.offer, req.offerId, req.searchId)
+        body = {"data": {"type": "flight-offers-pricing", "flightOffers": [offer]}}
+        res = await amadeus.price_offer(body)
+        # priced offers are stored too, so create-order can reference them by id
+        search_id = await offer_store.put((res.get("data") or {}).get("flightOffers") or [])
+        # You can map to the priced FlightSummary here if desired
+        return {"pricedOffer": res.get("data"), "searchId": search_id, "raw": res}
+
+    async def create_order(self, req: CreateOrderRequest) -> dict:
+        """Book at most once per idempotencyKey (IDEMPOTENCY_TTL) or identical request (IDEMPOTENCY_BODY_TTL).
+
+        Concurrent duplicates wait for the first call; later retries get its stored
+        result back with `replayed: true` instead of booking again.
+        """
+        fp = fingerprint(req.model_dump(include={"offer", "offerId", "searchId", "travelers", "testMode"}))
+        if req.idempotencyKey:
+            key, ttl = f"key:{req.idempotencyKey}", settings.IDEMPOTENCY_TTL
+        else:
+            key, ttl = f"body:{fp}", settings.IDEMPOTENCY_BODY_TTL
+        result, replayed = await idempotency.run(key, fp, lambda: self._create_order(req), ttl)
+        return {**result, "replayed": replayed}
+
+    async def _create_order(self, req: CreateOrderRequest) -> dict:
+        offer = await offer_store.resolve(req.offer, req.offerId, req.searchId)
+        body = {"data": {"type": "flight-order", "flightOffers": [offer], "travelers": req.travelers}}
+        res = await amadeus.create_order(body)
+        # simulated orders get their own id, so they can be told apart (and looked up) until persisted
+        reservation_id = res.get("data", {}).get("id") or f"resv_simulated_{uuid.uuid4().hex[:12]}"
+        # persisted write-behind: the booking response never waits on the database
+        reservation_writer.submit({
+            "reservation_id": reservation_id,
+            "status": "simulated",
+            "pnr": None,
+            "offer": offer,
+            "travelers": req.travelers,
+            "created_at": datetime.utcnow(),
+        })
+        # Return minimal normalized reservation
+        return {
+            "reservationId": reservation_id,
+            "status": "simulated",
+            "pnr": None,
+            "offer": None,
+            "travelers": req.travelers,
+            "raw": res
+        }
+
+flights_service = FlightsService()
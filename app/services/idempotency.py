@@ -0,0 +1,162 @@
+import asyncio, hashlib, time, uuid
+from typing import Any, Awaitable, Callable, Optional
+import orjson
+from redis.exceptions import RedisError
+from app.config import settings
+from app.services.cache import LocalTTLCache, SingleFlight
+from app.services.redis_client import get_redis, mark_down
+from app.services.token_manager import token_fetch_budget
+
+# release the lock only if it is still ours: it may have expired and been taken by another process
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+class IdempotencyConflict(RuntimeError):
+    """The key is in use: by a different request body, or by a call still running elsewhere."""
+
+def fingerprint(body: dict) -> str:
+    return hashlib.sha256(orjson.dumps(body, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+class IdempotencyStore:
+    """Run an operation at most once per key and replay its result for `ttl` seconds
+    (or the per-call ttl).
+
+    Concurrent calls with the same key in this process share one execution; across
+    processes a short Redis lock (`idem:<key>:lock`) makes later callers wait for the
+    stored result. Only successes are stored, so a failed call can be retried. Reusing
+    a key with a different request fingerprint raises IdempotencyConflict.
+    """
+
+    def __init__(self, ttl: float, local_max: int, lock_ttl: float):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self._local = LocalTTLCache(local_max)
+        self._flight = SingleFlight()
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    async def _read(self, key: str) -> Optional[dict]:
+        entry = self._local.get(key)
+        if entry is not None:
+            return entry
+        r = get_redis()
+        if r is None:
+            return None
+        try:
+            raw = await r.get(f"idem:{key}")
+        except RedisError as e:
+            mark_down(e)
+            return None
+        if not raw:
+            return None
+        entry = orjson.loads(raw)
+        self._local.set(key, entry, entry.get("ttl", self.ttl))
+        return entry
+
+    async def _write(self, key: str, entry: dict):
+        self._local.set(key, entry, entry["ttl"])
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            await r.set(f"idem:{key}", orjson.dumps(entry), ex=int(entry["ttl"]))
+        except RedisError as e:
+            mark_down(e)
+
+    async def _lock(self, key: str, owner: str) -> bool:
+        """False if another process holds the key; True when locked here or Redis is absent."""
+        r = get_redis()
+        if r is None:
+            return True
+        try:
+            return bool(await r.set(f"idem:{key}:lock", owner, nx=True, ex=int(self.lock_ttl)))
+        except RedisError as e:
+            mark_down(e)
+            return True
+
+    async def _unlock(self, key: str, owner: str):
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            await r.eval(_UNLOCK_LUA, 1, f"idem:{key}:lock", owner)
+        except RedisError as e:
+            mark_down(e)
+
+    async def _await_other(self, key: str) -> Optional[dict]:
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.25)
+            entry = await self._read(key)
+            if entry is not None:
+                return entry
+            r = get_redis()
+            if r is None:
+                return None
+            try:
+                if not await r.exists(f"idem:{key}:lock"):
+                    return None
+            except RedisError as e:
+                mark_down(e)
+                return None
+        return None
+
+    async def _execute(self, key: str, fp: str, fn: Callable[[], Awaitable[Any]], ttl: float) -> tuple[dict, bool]:
+        """`(entry, ran)`; `ran` is False when another process produced the entry."""
+        owner = uuid.uuid4().hex
+        if not await self._lock(key, owner):
+            entry = await self._await_other(key)
+            if entry is None:
+                self.conflicts += 1
+                raise IdempotencyConflict("a request with this idempotency key is still in progress")
+            return entry, False
+        try:
+            # another process may have stored its result and unlocked since our first read
+            entry = await self._read(key)
+            if entry is not None:
+                return entry, False
+            entry = {"fp": fp, "result": await fn(), "ttl": ttl}
+            self.executed += 1
+            await self._write(key, entry)
+            return entry, True
+        finally:
+            await self._unlock(key, owner)
+
+    async def run(self, key: str, fp: str, fn: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> tuple[Any, bool]:
+        """Return `(result, replayed)`; `replayed` is True when `fn` did not run for this call."""
+        entry = await self._read(key)
+        if entry is not None:
+            replayed = True
+        else:
+            (entry, ran), shared = await self._flight.do(key, lambda: self._execute(key, fp, fn, ttl or self.ttl))
+            if shared:
+                self.coalesced += 1
+            replayed = shared or not ran
+        if entry["fp"] != fp:
+            self.conflicts += 1
+            raise IdempotencyConflict("idempotency key was already used with a different request")
+        if replayed:
+            self.replayed += 1
+        return entry["result"], replayed
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+            "localEntries": len(self._local),
+        }
+
+idempotency = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL,
+    local_max=settings.IDEMPOTENCY_LOCAL_MAX,
+    # held for the whole create_order call: every attempt (the first plus each 429 retry) can
+    # queue for a limiter slot and then run to the order timeout, after a retried token fetch
+    lock_ttl=(settings.RATE_LIMIT_429_RETRIES + 1) * (settings.RATE_LIMIT_MAX_WAIT + settings.AMADEUS_ORDER_TIMEOUT)
+    + token_fetch_budget() + 5,
+)
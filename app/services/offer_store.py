@@ -0,0 +1,105 @@
+import uuid, zlib
+from typing import Optional
+import orjson
+from redis.exceptions import RedisError
+from app.config import settings
+from app.services.cache import LocalTTLCache
+from app.services.redis_client import get_redis, mark_down
+
+class OfferNotFound(LookupError):
+    pass
+
+def split_ref(offer_id: str, search_id: Optional[str] = None) -> tuple[str, str]:
+    """Accept either (searchId, offerId) or a single "searchId:offerId" reference."""
+    if search_id:
+        return search_id, offer_id
+    if ":" not in offer_id:
+        raise OfferNotFound(f"offer {offer_id!r} needs a searchId (or use 'searchId:offerId')")
+    sid, oid = offer_id.split(":", 1)
+    return sid, oid
+
+class OfferStore:
+    """Raw Amadeus offers kept server-side, keyed by search id and offer id.
+
+    Lets /amadeus/price and /amadeus/create-order (and the agent tools) reference an
+    offer by id instead of echoing the full offer JSON back. Offers are zlib-compressed
+    in an in-process LRU and, when available, a Redis hash per search.
+    """
+
+    def __init__(self, ttl: float, local_max: int):
+        self.ttl = ttl
+        self._local = LocalTTLCache(local_max)
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _pack(offer: dict) -> bytes:
+        return zlib.compress(orjson.dumps(offer), 1)
+
+    @staticmethod
+    def _unpack(raw: bytes) -> dict:
+        return orjson.loads(zlib.decompress(raw))
+
+    async def put(self, offers: list[dict], search_id: Optional[str] = None) -> str:
+        search_id = search_id or uuid.uuid4().hex[:10]
+        packed = {str(o.get("id", i)): self._pack(o) for i, o in enumerate(offers)}
+        for oid, raw in packed.items():
+            self._local.set((search_id, oid), raw, self.ttl)
+        self.stored += len(packed)
+        r = get_redis()
+        if r is not None and packed:
+            try:
+                key = f"offers:{search_id}"
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.hset(key, mapping=packed)
+                    pipe.expire(key, int(self.ttl))
+                    await pipe.execute()
+            except RedisError as e:
+                mark_down(e)
+        return search_id
+
+    async def has(self, search_id: str, offers: list[dict]) -> bool:
+        """Whether `offers` are (still) stored under `search_id`; checks the first one."""
+        if not offers:
+            return True
+        oid = str(offers[0].get("id", 0))
+        if self._local.get((search_id, oid)) is not None:
+            return True
+        r = get_redis()
+        if r is None:
+            return False
+        try:
+            return bool(await r.hexists(f"offers:{search_id}", oid))
+        except RedisError as e:
+            mark_down(e)
+            return False
+
+    async def get(self, search_id: str, offer_id: str) -> dict:
+        raw = self._local.get((search_id, offer_id))
+        if raw is None:
+            r = get_redis()
+            if r is not None:
+                try:
+                    raw = await r.hget(f"offers:{search_id}", offer_id)
+                except RedisError as e:
+                    mark_down(e)
+            if raw is not None:
+                self._local.set((search_id, offer_id), raw, self.ttl)
+        if raw is None:
+            self.misses += 1
+            raise OfferNotFound(f"offer {search_id}:{offer_id} not found or expired; search again")
+        self.hits += 1
+        return self._unpack(raw)
+
+    async def resolve(self, offer: Optional[dict], offer_id: Optional[str], search_id: Optional[str] = None) -> dict:
+        if offer:
+            return offer
+        if not offer_id:
+            raise OfferNotFound("provide offer, or offerId (+ searchId)")
+        return await self.get(*split_ref(offer_id, search_id))
+
+    def stats(self) -> dict:
+        return {"stored": self.stored, "hits": self.hits, "misses": self.misses, "localEntries": len(self._local)}
+
+offer_store = OfferStore(ttl=settings.OFFER_STORE_TTL, local_max=settings.OFFER_STORE_LOCAL_MAX)
@@ -0,0 +1,163 @@
+import asyncio, functools, logging, time
+from datetime import date
+from typing import Optional
+from redis.exceptions import RedisError
+from app.config import settings
+from app.services.amadeus_client import amadeus
+from app.services.rate_limiter import Priority, RateLimited
+from app.services.redis_client import get_redis, mark_down
+from app.services.search_cache import search_cache, cache_key
+
+log = logging.getLogger(__name__)
+
+class Prefetcher:
+    """Keeps the most searched route/date queries warm in the search cache.
+
+    Every search adds 1 to its query's score; scores halve every `half_life` seconds.
+    Each `interval` the top `top_n` queries seen at least `min_hits` times are
+    refreshed if their cache entry is missing or would go stale before the next
+    cycle, within `calls_per_minute` upstream calls, at Priority.PREFETCH (never
+    queued: a busy rate limiter ends the cycle). With Redis, one worker per cycle does
+    the refreshing and every worker reads the shared cache; popularity is per worker.
+    """
+
+    def __init__(self, interval: float, top_n: int, min_hits: float, half_life: float,
+                 calls_per_minute: float, track_max: int, enabled: bool = True):
+        self.interval = interval
+        self.top_n = top_n
+        self.min_hits = min_hits
+        self.half_life = half_life
+        self.calls_per_minute = calls_per_minute
+        self.track_max = track_max
+        self.enabled = enabled
+        # cache key -> [score, canonical query]
+        self._scores: dict[str, list] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._fetch = functools.partial(amadeus.search_offers, priority=Priority.PREFETCH)
+        self.cycles = 0
+        self.refreshed = 0
+        self.deferred = 0
+        self.failed = 0
+        self.last_cycle: Optional[dict] = None
+
+    def record(self, query: dict):
+        """Count one search (canonical params, as cached)."""
+        if not self.enabled:
+            return
+        key = cache_key(query)
+        item = self._scores.get(key)
+        if item is None:
+            if len(self._scores) >= self.track_max:
+                self._prune(self.track_max // 2)
+            self._scores[key] = [1.0, query]
+        else:
+            item[0] += 1.0
+
+    def _prune(self, keep: int):
+        ranked = sorted(self._scores.items(), key=lambda kv: kv[1][0], reverse=True)
+        self._scores = dict(ranked[:keep])
+
+    def _decay(self):
+        factor = 0.5 ** (self.interval / self.half_life)
+        today = date.today().isoformat()
+        for key in list(self._scores):
+            item = self._scores[key]
+            item[0] *= factor
+            # faded out, or the departure date has passed
+            if item[0] < 0.1 or item[1].get("departureDate", today) < today:
+                del self._scores[key]
+
+    def top(self) -> list[tuple[float, dict]]:
+        ranked = sorted(self._scores.values(), key=lambda item: item[0], reverse=True)
+        return [(score, query) for score, query in ranked[:self.top_n] if score >= self.min_hits]
+
+    async def _leader(self) -> bool:
+        r = get_redis()
+        if r is None:
+            return True
+        try:
+            return bool(await r.set("prefetch:lock", b"1", nx=True, ex=max(int(self.interval * 0.9), 1)))
+        except RedisError as e:
+            mark_down(e)
+            return True
+
+    async def run_once(self) -> dict:
+        self._decay()
+        cycle = {"candidates": 0, "refreshed": 0, "fresh": 0, "deferred": 0, "failed": 0}
+        if not await self._leader():
+            return {**cycle, "skipped": "another worker is prefetching"}
+        budget = max(int(self.calls_per_minute * self.interval / 60), 1)
+        horizon = self.interval * 1.5
+        for _, query in self.top():
+            cycle["candidates"] += 1
+            left = await search_cache.expires_in(query)
+            if left is not None and left > horizon:
+                cycle["fresh"] += 1
+                continue
+            if cycle["refreshed"] >= budget:
+                cycle["deferred"] += 1
+                continue
+            try:
+                await search_cache.refresh(query, self._fetch)
+            except RateLimited:
+                # no spare upstream capacity (or the circuit is open): try again next cycle
+                cycle["deferred"] += 1
+                break
+            except Exception as e:
+                cycle["failed"] += 1
+                log.warning("Prefetch of %s %s-%s failed: %s", query.get("departureDate"),
+                            query.get("originLocationCode"), query.get("destinationLocationCode"), e)
+                continue
+            cycle["refreshed"] += 1
+        self.cycles += 1
+        self.refreshed += cycle["refreshed"]
+        self.deferred += cycle["deferred"]
+        self.failed += cycle["failed"]
+        return cycle
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            started = time.perf_counter()
+            try:
+                cycle = await self.run_once()
+            except Exception as e:
+                log.warning("Prefetch cycle failed: %s", e)
+                continue
+            self.last_cycle = {**cycle, "ms": round((time.perf_counter() - started) * 1000)}
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "tracked": len(self._scores),
+            "hot": len(self.top()),
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            "lastCycle": self.last_cycle,
+        }
+
+prefetcher = Prefetcher(
+    interval=settings.PREFETCH_INTERVAL,
+    top_n=settings.PREFETCH_TOP_N,
+    min_hits=settings.PREFETCH_MIN_HITS,
+    half_life=settings.PREFETCH_HALF_LIFE,
+    calls_per_minute=settings.PREFETCH_CALLS_PER_MINUTE,
+    track_max=settings.PREFETCH_TRACK_MAX,
+    enabled=settings.PREFETCH_ENABLED and settings.SEARCH_CACHE_ENABLED,
+)
@@ -0,0 +1,230 @@
+import asyncio, heapq, itertools, logging, time
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Optional
+from redis.exceptions import RedisError
+from app.config import settings
+from app.services.redis_client import get_redis, mark_down
+
+log = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    # lower value is served first
+    BOOKING = 0
+    PRICING = 1
+    SEARCH = 2
+    PREFETCH = 3
+
+class RateLimited(RuntimeError):
+    """No upstream slot within the caller's deadline (or the queue was full)."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Token bucket shared by all workers. Returns the seconds to wait before a token is
+# available (0 = taken). A pause key set after a 429 blocks every worker until it expires.
+_BUCKET_LUA = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then return tostring(pause / 1000) end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 10)
+return tostring(wait)
+"""
+
+class RateLimiter:
+    """Token bucket with priority queueing in front of every Amadeus call.
+
+    Callers that find no token wait in a heap ordered by (priority, arrival), so
+    bookings overtake pricing, pricing overtakes searches and prefetches never queue.
+    Waits are bounded by `max_wait` and the queue by `queue_max` (a full queue evicts
+    its lowest-priority waiter for a more important one). A 429 halves the rate and
+    pauses all calls for Retry-After; successes then raise it back step by step (AIMD).
+    With Redis the bucket and the pause are shared by all workers; priority order is
+    per worker.
+    """
+
+    def __init__(self, rate: float, burst: float, queue_max: int, max_wait: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.queue_max = queue_max
+        self.max_wait = max_wait
+        self._tokens = burst
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+        self._last_raise = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._script = None
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    # --- bucket ---
+
+    def _take_local(self) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def _take(self) -> float:
+        """Take one token; 0 on success, else seconds until one should be available."""
+        r = get_redis()
+        if r is None:
+            return self._take_local()
+        try:
+            if self._script is None:
+                self._script = r.register_script(_BUCKET_LUA)
+            wait = await self._script(
+                keys=["amadeus:ratelimit", "amadeus:ratelimit:pause"], args=[self.rate, self.burst]
+            )
+            return float(wait)
+        except RedisError as e:
+            mark_down(e)
+            return self._take_local()
+
+    # --- queue ---
+
+    def _enqueue(self, priority: Priority) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        if len(self._waiters) >= self.queue_max:
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                raise RateLimited("Amadeus rate limit queue is full")
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            if not worst[2].done():
+                worst[2].set_exception(RateLimited("evicted by higher-priority Amadeus call"))
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        return fut
+
+    async def _run_pump(self):
+        while self._waiters:
+            if self._waiters[0][2].done():  # timed out or evicted
+                heapq.heappop(self._waiters)
+                continue
+            wait = await self._take()
+            if wait > 0:
+                await asyncio.sleep(min(wait, 1.0))
+                continue
+            while self._waiters:
+                _, _, fut = heapq.heappop(self._waiters)
+                if not fut.done():
+                    fut.set_result(None)
+                    break
+
+    async def acquire(self, priority: Priority = Priority.SEARCH, max_wait: Optional[float] = None):
+        if not self.enabled:
+            return
+        if not self._waiters and await self._take() == 0:
+            self.granted += 1
+            return
+        # prefetch only uses capacity nobody else is waiting for
+        wait_limit = 0.0 if priority == Priority.PREFETCH else (self.max_wait if max_wait is None else max_wait)
+        if wait_limit <= 0:
+            self.rejected += 1
+            raise RateLimited("no Amadeus capacity for a prefetch right now", self._retry_after())
+        try:
+            fut = self._enqueue(priority)
+        except RateLimited:
+            self.rejected += 1
+            raise
+        self.queued += 1
+        try:
+            await asyncio.wait_for(fut, wait_limit)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimited(f"no Amadeus slot within {wait_limit:.1f}s", self._retry_after())
+        except RateLimited:
+            self.rejected += 1
+            raise
+        self.granted += 1
+
+    def _retry_after(self) -> float:
+        return max(self._paused_until - time.monotonic(), len(self._waiters) / self.rate, 1.0)
+
+    # --- feedback ---
+
+    async def on_throttled(self, retry_after: Optional[float]):
+        """Upstream answered 429: back off multiplicatively and pause for Retry-After."""
+        self.throttled += 1
+        pause = retry_after if retry_after is not None else 1.0
+        self.rate = max(self.max_rate * 0.1, self.rate / 2)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        self._last_raise = time.monotonic() + pause
+        log.warning("Amadeus 429: pausing %.1fs, rate now %.2f/s", pause, self.rate)
+        r = get_redis()
+        if r is not None:
+            try:
+                await r.set("amadeus:ratelimit:pause", b"1", px=max(int(pause * 1000), 1))
+            except RedisError as e:
+                mark_down(e)
+
+    def on_success(self):
+        # additive increase: +10% of the configured rate per second without a 429
+        if self.rate < self.max_rate:
+            now = time.monotonic()
+            if now - self._last_raise >= 1.0:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+                self._last_raise = now
+
+    def stats(self) -> dict:
+        waiting = {p.name.lower(): 0 for p in Priority}
+        for prio, _, fut in self._waiters:
+            if not fut.done():
+                waiting[Priority(prio).name.lower()] += 1
+        return {
+            "enabled": self.enabled,
+            "rate": round(self.rate, 2),
+            "maxRate": self.max_rate,
+            "burst": self.burst,
+            "waiting": waiting,
+            "granted": self.granted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled429": self.throttled,
+            "pausedFor": round(max(self._paused_until - time.monotonic(), 0), 2),
+        }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+rate_limiter = RateLimiter(
+    rate=settings.RATE_LIMIT_RPS,
+    burst=settings.RATE_LIMIT_BURST,
+    queue_max=settings.RATE_LIMIT_QUEUE_MAX,
+    max_wait=settings.RATE_LIMIT_MAX_WAIT,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
@@ -0,0 +1,37 @@
+import logging, time
+import redis.asyncio as aioredis
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+_client: aioredis.Redis | None = None
+_down_until = 0.0
+
+def get_redis() -> aioredis.Redis | None:
+    """Shared asyncio Redis client, or None when Redis is disabled or recently unreachable.
+
+    Callers treat Redis as optional: on any RedisError they call `mark_down()` and
+    fall back to their in-process tier.
+    """
+    global _client
+    if not settings.REDIS_URL or time.monotonic() < _down_until:
+        return None
+    if _client is None:
+        _client = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _client
+
+def mark_down(exc: Exception):
+    global _down_until
+    if time.monotonic() >= _down_until:
+        log.warning("Redis unavailable (%s); using in-process fallback for %ss", exc, settings.REDIS_RETRY_AFTER)
+    _down_until = time.monotonic() + settings.REDIS_RETRY_AFTER
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
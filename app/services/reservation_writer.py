@@ -0,0 +1,149 @@
+import asyncio, logging, time
+from typing import Optional
+from sqlalchemy import insert
+from app.config import settings
+from app.db.models import ReservationModel
+from app.metrics import span
+
+log = logging.getLogger(__name__)
+
+class ReservationWriter:
+    """Write-behind queue for reservations created by /amadeus/create-order.
+
+    `submit` never waits on the database: rows go into a bounded in-memory queue and a
+    background task inserts them in batches (one executemany per batch), retrying with
+    backoff. A full backlog drops the row and counts it instead of blocking bookings.
+    `stop` flushes whatever is still queued on shutdown.
+    """
+
+    def __init__(self, batch_size: int, max_backlog: int, interval: float, retries: int):
+        self.batch_size = batch_size
+        self.max_backlog = max_backlog
+        self.interval = interval
+        self.retries = retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._batch: list[dict] = []
+        # reservation_id -> row, until it is committed (GET /reservations/{id} reads it)
+        self._pending: dict[str, dict] = {}
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(self.max_backlog)
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, row: dict) -> bool:
+        if self._queue is None:
+            self.dropped += 1
+            log.warning("Reservation writer not started; dropped %s", row.get("reservation_id"))
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("Reservation backlog full (%d); dropped %s", self.max_backlog, row.get("reservation_id"))
+            return False
+        self._pending[row["reservation_id"]] = row
+        return True
+
+    def pending(self, reservation_id: str) -> Optional[dict]:
+        return self._pending.get(reservation_id)
+
+    def _drain(self) -> list[dict]:
+        batch = []
+        while not self._queue.empty() and len(batch) < self.batch_size:
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _insert(self, rows: list[dict]):
+        from app.deps import engine, async_engine
+        with span("db", "reservations.insert"):
+            if async_engine is not None:
+                async with async_engine.begin() as conn:
+                    await conn.execute(insert(ReservationModel), rows)
+            else:
+                def run():
+                    with engine.begin() as conn:
+                        conn.execute(insert(ReservationModel), rows)
+                await asyncio.to_thread(run)
+
+    async def _write(self, rows: list[dict]):
+        for attempt in range(self.retries + 1):
+            try:
+                await self._insert(rows)
+            except Exception as e:
+                if attempt < self.retries:
+                    await asyncio.sleep(min(0.2 * 2 ** attempt, 5.0))
+                    continue
+                self.failed += len(rows)
+                log.error("Reservation batch of %d lost after %d attempts: %s", len(rows), attempt + 1, e)
+            else:
+                self.written += len(rows)
+                self.batches += 1
+            break
+        for row in rows:
+            # only if it is still this row: a later submit may reuse the reservation id
+            if self._pending.get(row["reservation_id"]) is row:
+                del self._pending[row["reservation_id"]]
+
+    async def _run(self):
+        # rows being collected live on self so a shutdown cancel cannot lose them
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = time.monotonic() + self.interval
+            while len(self._batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            # shielded: cancelling the loop never abandons an insert halfway
+            await asyncio.shield(self._inflight)
+
+    async def stop(self, timeout: float = 10.0):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        async def flush():
+            if self._inflight is not None:
+                await self._inflight
+            batch, self._batch = self._batch or self._drain(), []
+            while batch:
+                await self._write(batch)
+                batch = self._drain()
+        try:
+            await asyncio.wait_for(flush(), timeout)
+        except asyncio.TimeoutError:
+            log.error("Reservation flush timed out; %d rows not written", len(self._pending))
+
+    def stats(self) -> dict:
+        return {
+            "backlog": self._queue.qsize() if self._queue is not None else 0,
+            "maxBacklog": self.max_backlog,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+reservation_writer = ReservationWriter(
+    batch_size=settings.RESERVATION_WRITE_BATCH,
+    max_backlog=settings.RESERVATION_WRITE_BACKLOG,
+    interval=settings.RESERVATION_WRITE_INTERVAL,
+    retries=settings.RESERVATION_WRITE_RETRIES,
+)
@@ -0,0 +1,46 @@
+from typing import Optional
+from sqlalchemy.orm import defer
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.metrics import timed
+from app.db.models import ReservationModel
+
+# Reservations are written by reservation_writer (write-behind); this side only reads.
+
+def _list_stmt(page: int, page_size: int, before: Optional[int]):
+    stmt = select(ReservationModel).options(defer(ReservationModel.offer), defer(ReservationModel.travelers))
+    if before is not None:
+        stmt = stmt.where(ReservationModel.id < before)
+    else:
+        stmt = stmt.offset((page - 1) * page_size)
+    return stmt.order_by(ReservationModel.id.desc()).limit(page_size)
+
+def _get_stmt(reservation_id: str):
+    # newest row wins if the upstream reused an id (e.g. simulated bookings)
+    return (
+        select(ReservationModel)
+        .where(ReservationModel.reservation_id == reservation_id)
+        .order_by(ReservationModel.id.desc())
+        .limit(1)
+    )
+
+class ReservationsService:
+    @timed("db", "reservations.list")
+    def list(self, session: Session, page: int = 1, page_size: int = 20, before: Optional[int] = None):
+        return session.exec(_list_stmt(page, page_size, before)).all()
+
+    @timed("db", "reservations.get")
+    def get(self, session: Session, reservation_id: str) -> Optional[ReservationModel]:
+        return session.exec(_get_stmt(reservation_id)).first()
+
+class AsyncReservationsService:
+    @timed("db", "reservations.list")
+    async def list(self, session: AsyncSession, page: int = 1, page_size: int = 20, before: Optional[int] = None):
+        return (await session.exec(_list_stmt(page, page_size, before))).all()
+
+    @timed("db", "reservations.get")
+    async def get(self, session: AsyncSession, reservation_id: str) -> Optional[ReservationModel]:
+        return (await session.exec(_get_stmt(reservation_id))).first()
+
+reservations_service = ReservationsService()
+async_reservations_service = AsyncReservationsService()
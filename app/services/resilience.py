@@ -0,0 +1,156 @@
+import asyncio, contextvars, random, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+import httpx
+from app.config import settings
+from app.services.rate_limiter import RateLimited
+
+# --- deadlines ---
+# Absolute time.monotonic() by which the current request must be answered. Set per
+# request by the RequestContext middleware (and per agent tool call); every Amadeus call sizes
+# its timeout and rate-limit wait from what is left.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("amadeus_deadline", default=None)
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The caller's time budget ran out before (or while) Amadeus answered."""
+
+@contextmanager
+def within(seconds: Optional[float]):
+    """Bound the enclosed calls by `seconds` from now (never extends an outer deadline)."""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining(cap: float) -> float:
+    """Seconds left for the next upstream step, at most `cap`; raises once the deadline passed."""
+    at = _deadline.get()
+    if at is None:
+        return cap
+    left = at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded before calling Amadeus")
+    return min(cap, left)
+
+def detached() -> contextvars.Context:
+    """Context for background tasks spawned by a request (they outlive its deadline)."""
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    return ctx
+
+def backoff(attempt: int) -> Optional[float]:
+    """Full-jitter delay before retry `attempt` (0-based), or None if the deadline leaves no room."""
+    delay = random.uniform(0, min(settings.AMADEUS_RETRY_MAX_DELAY, settings.AMADEUS_RETRY_BASE_DELAY * 2 ** attempt))
+    at = _deadline.get()
+    if at is not None and at - time.monotonic() < delay + 0.05:
+        return None
+    return delay
+
+def is_unavailable(e: BaseException) -> bool:
+    """Errors that say "Amadeus cannot answer right now" (as opposed to a bad request)."""
+    if isinstance(e, (RateLimited, DeadlineExceeded, httpx.TransportError)):
+        return True
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500
+
+# --- circuit breaker ---
+
+class CircuitOpen(RateLimited):
+    """Amadeus is failing; calls fail fast until the cooldown ends (answered like RateLimited: 503)."""
+
+class CircuitBreaker:
+    """Opens when at least `failure_ratio` of the last `window` calls failed (5xx, timeouts,
+    connection errors; with at least `min_calls` seen). While open every call fails fast
+    with CircuitOpen; after `cooldown` one probe call is let through and its outcome
+    closes the breaker or opens it for another cooldown.
+    """
+
+    def __init__(self, window: int, min_calls: int, failure_ratio: float, cooldown: float):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._results: deque[bool] = deque(maxlen=window)
+        self._retry_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    def check(self):
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        if now >= self._retry_at:
+            # this caller is the probe; others keep failing fast until it reports
+            self.state = "half_open"
+            self._retry_at = now + self.cooldown
+            return
+        self.rejected += 1
+        raise CircuitOpen("Amadeus is unavailable (circuit open)", self._retry_at - now)
+
+    def record(self, ok: bool):
+        if self.state != "closed":
+            if ok:
+                self.state = "closed"
+                self._results.clear()
+            else:
+                self._open()
+            return
+        self._results.append(ok)
+        n = len(self._results)
+        if n >= self.min_calls and self._results.count(False) / n >= self.failure_ratio:
+            self._open()
+
+    def _open(self):
+        if self.state == "closed":
+            self.opened += 1
+        self.state = "open"
+        self._retry_at = time.monotonic() + self.cooldown
+        self._results.clear()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "recentFailures": self._results.count(False),
+            "recentCalls": len(self._results),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retryIn": round(max(self._retry_at - time.monotonic(), 0), 2) if self.state != "closed" else 0,
+        }
+
+# --- hedging ---
+
+class LatencyWindow:
+    """Recent successful latencies of one operation; the hedge delay is their quantile."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=size)
+        self._cached: Optional[float] = None
+        self._since = 0
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self._since += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        # re-sorting 200 floats every 20 samples is cheaper than a streaming estimator here
+        if self._cached is None or self._since >= 20:
+            ordered = sorted(self._samples)
+            self._cached = ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+            self._since = 0
+        return self._cached
+
+breaker = CircuitBreaker(
+    window=settings.AMADEUS_BREAKER_WINDOW,
+    min_calls=settings.AMADEUS_BREAKER_MIN_CALLS,
+    failure_ratio=settings.AMADEUS_BREAKER_FAILURE_RATIO,
+    cooldown=settings.AMADEUS_BREAKER_COOLDOWN,
+)
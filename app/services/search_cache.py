@@ -0,0 +1,175 @@
+import asyncio, hashlib, logging, time
+from typing import Awaitable, Callable
+import orjson
+from redis.exceptions import RedisError
+from app.config import settings
+from app.schemas import FlightSearchParams
+from app.services.cache import LocalTTLCache, SingleFlight
+from app.services.redis_client import get_redis, mark_down
+from app.services.resilience import detached, is_unavailable
+
+log = logging.getLogger(__name__)
+
+UPPER_FIELDS = ("originLocationCode", "destinationLocationCode", "travelClass", "currencyCode")
+
+def canonical_params(params: FlightSearchParams | dict) -> dict:
+    """Normalize a search so equivalent requests share one cache entry.
+
+    Defaults are applied, codes upper-cased, strings stripped and None dropped;
+    the result is also what gets sent upstream.
+    """
+    if not isinstance(params, FlightSearchParams):
+        params = FlightSearchParams.model_validate(params)
+    out = {}
+    for k, v in params.model_dump(exclude_none=True).items():
+        if isinstance(v, str):
+            v = v.strip()
+            if k in UPPER_FIELDS:
+                v = v.upper()
+        out[k] = v
+    return out
+
+def cache_key(query: dict) -> str:
+    digest = hashlib.sha1(orjson.dumps(query, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f"search:v1:{digest}"
+
+class SearchCache:
+    """Two-tier (in-process + Redis) cache for raw Amadeus search responses.
+
+    Entries are fresh for `ttl` seconds and then served stale for up to `stale_ttl`
+    more while a single background refresh runs. Concurrent misses for the same key
+    share one upstream call. For `error_ttl` after that an entry is only served when
+    the refetch fails because Amadeus is unavailable (circuit open, 5xx, timeouts).
+    Each fill is stamped with a `searchId` that names its offers in the offer store.
+    A local copy past its fresh window is checked against Redis before revalidating,
+    so a fill by any worker is served by all of them.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, local_max: int, enabled: bool = True, error_ttl: float = 0.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self.enabled = enabled
+        self._local = LocalTTLCache(local_max)
+        self._flight = SingleFlight()
+        self._tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.fallbacks = 0
+
+    async def _read(self, key: str) -> dict | None:
+        entry = self._local.get(key)
+        if entry is not None and time.time() < entry["fresh_until"]:
+            return entry
+        # past fresh here: another worker (or the prefetcher) may have refilled Redis already
+        r = get_redis()
+        if r is None:
+            return entry
+        try:
+            raw = await r.get(key)
+        except RedisError as e:
+            mark_down(e)
+            return entry
+        if not raw:
+            return entry
+        shared = orjson.loads(raw)
+        if entry is not None and shared["fresh_until"] <= entry["fresh_until"]:
+            return entry
+        self._local.set(key, shared, max(shared.get("error_until", shared["stale_until"]) - time.time(), 0))
+        return shared
+
+    async def _write(self, key: str, data: dict):
+        now = time.time()
+        keep = self.ttl + self.stale_ttl + self.error_ttl
+        entry = {"data": data, "fresh_until": now + self.ttl, "stale_until": now + self.ttl + self.stale_ttl,
+                 "error_until": now + keep}
+        self._local.set(key, entry, keep)
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            await r.set(key, orjson.dumps(entry), ex=int(keep))
+        except RedisError as e:
+            mark_down(e)
+
+    async def _load(self, key: str, query: dict, fetch: Callable[[dict], Awaitable[dict]]) -> dict:
+        async def run():
+            # each fill gets its own searchId, so hits on it reuse one offer-store entry
+            data = await fetch(query)
+            data = {**data, "searchId": hashlib.sha1(f"{key}:{time.time()}".encode()).hexdigest()[:10]}
+            await self._write(key, data)
+            return data
+        data, shared = await self._flight.do(key, run)
+        if shared:
+            self.coalesced += 1
+        return data
+
+    def _revalidate(self, key: str, query: dict, fetch: Callable[[dict], Awaitable[dict]]):
+        if key in self._flight:
+            return
+        # not bound by the deadline of the request that noticed the staleness
+        task = asyncio.create_task(self._load(key, query, fetch), context=detached())
+        self._tasks.add(task)
+        task.add_done_callback(self._revalidated)
+
+    def _revalidated(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+            log.warning("Search cache revalidation failed: %s", task.exception())
+
+    async def get_or_fetch(self, params: FlightSearchParams | dict, fetch: Callable[[dict], Awaitable[dict]]) -> dict:
+        query = canonical_params(params)
+        if not self.enabled:
+            return await fetch(query)
+        key = cache_key(query)
+        entry = await self._read(key)
+        now = time.time()
+        if entry is not None and now < entry["fresh_until"]:
+            self.hits += 1
+            return entry["data"]
+        if entry is not None and now < entry["stale_until"]:
+            self.stale_hits += 1
+            self._revalidate(key, query, fetch)
+            return entry["data"]
+        self.misses += 1
+        try:
+            return await self._load(key, query, fetch)
+        except Exception as e:
+            if entry is None or not is_unavailable(e):
+                raise
+            self.fallbacks += 1
+            log.warning("Amadeus unavailable (%s); serving an expired search result", e)
+            return entry["data"]
+
+    async def expires_in(self, query: dict) -> float | None:
+        """Seconds until the cached result for canonical `query` goes stale (None if absent)."""
+        entry = await self._read(cache_key(query))
+        return None if entry is None else entry["fresh_until"] - time.time()
+
+    async def refresh(self, query: dict, fetch: Callable[[dict], Awaitable[dict]]) -> dict:
+        """Fetch canonical `query` now and store it (shares an in-flight fetch for the same key)."""
+        return await self._load(cache_key(query), query, fetch)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "revalidateErrors": self.errors,
+            "unavailableFallbacks": self.fallbacks,
+            "localEntries": len(self._local),
+        }
+
+search_cache = SearchCache(
+    ttl=settings.SEARCH_CACHE_TTL,
+    stale_ttl=settings.SEARCH_CACHE_STALE_TTL,
+    local_max=settings.SEARCH_CACHE_LOCAL_MAX,
+    enabled=settings.SEARCH_CACHE_ENABLED,
+    error_ttl=settings.SEARCH_CACHE_ERROR_TTL,
+)
@@ -0,0 +1,177 @@
+import asyncio, json, logging, time, uuid
+from typing import Awaitable, Callable
+from redis.exceptions import RedisError
+from app.config import settings
+from app.services.redis_client import get_redis, mark_down
+
+log = logging.getLogger(__name__)
+
+TOKEN_KEY = "amadeus:token"
+LOCK_KEY = "amadeus:token:lock"
+# retry policy of `AmadeusClient._fetch_token`; the refresh lock (and the idempotency
+# lock around bookings) is sized from it
+TOKEN_FETCH_ATTEMPTS = 3
+TOKEN_FETCH_WAIT = (1, 8)  # exponential backoff between attempts, seconds (min, max)
+
+def token_fetch_budget() -> float:
+    """Worst-case seconds for one retried token fetch: every attempt times out after the longest wait."""
+    return TOKEN_FETCH_ATTEMPTS * settings.AMADEUS_TOKEN_TIMEOUT + (TOKEN_FETCH_ATTEMPTS - 1) * TOKEN_FETCH_WAIT[1]
+
+# release the refresh lock only if it is still ours: it may have expired and been taken by another worker
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+class TokenManager:
+    """OAuth token holder for AmadeusClient.
+
+    - concurrent refreshes are coalesced into a single upstream request
+    - a background task refreshes `margin` seconds before expiry, so user requests
+      normally never wait on OAuth
+    - with `shared=True` the token is published in Redis so every worker reuses it
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[dict]], margin: float, shared: bool = False):
+        self._fetch = fetch
+        self._margin = margin
+        self._shared = shared
+        self._token: str | None = None
+        self._exp = 0.0
+        self._inflight: asyncio.Future | None = None
+        self._refresher: asyncio.Task | None = None
+        self.refreshes = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    def _valid(self, skew: float = 30) -> bool:
+        return bool(self._token) and time.time() < self._exp - skew
+
+    async def get(self) -> str:
+        if self._valid():
+            return self._token
+        if self._shared and await self._load_shared():
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+            self._inflight.add_done_callback(self._clear_inflight)
+        else:
+            self.coalesced += 1
+        # shield: one cancelled caller must not cancel the refresh for everybody else
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, fut: asyncio.Future):
+        if self._inflight is fut:
+            self._inflight = None
+
+    async def _refresh(self) -> str:
+        if self._shared:
+            token = await self._refresh_shared()
+            if token:
+                return token
+        return await self._refresh_local()
+
+    async def _refresh_local(self) -> str:
+        data = await self._fetch()
+        self.refreshes += 1
+        self._token = data["access_token"]
+        self._exp = time.time() + int(data["expires_in"])
+        return self._token
+
+    async def _load_shared(self, min_ttl: float = 30) -> bool:
+        r = get_redis()
+        if r is None:
+            return False
+        try:
+            raw = await r.get(TOKEN_KEY)
+        except RedisError as e:
+            mark_down(e)
+            return False
+        if not raw:
+            return False
+        doc = json.loads(raw)
+        if time.time() >= doc["exp"] - min_ttl:
+            return False
+        self._token, self._exp = doc["access_token"], float(doc["exp"])
+        self.shared_hits += 1
+        return True
+
+    async def _refresh_shared(self) -> str | None:
+        """One worker refreshes under a Redis lock; the others wait for its result."""
+        r = get_redis()
+        if r is None:
+            return None
+        try:
+            # Another worker may already have refreshed ahead of our own schedule.
+            if await self._load_shared(min_ttl=self._margin):
+                return self._token
+            owner = uuid.uuid4().hex
+            budget = token_fetch_budget()
+            if await r.set(LOCK_KEY, owner, nx=True, px=int(budget * 1000) + 1000):
+                try:
+                    token = await self._refresh_local()
+                    # the token is ours either way: a failed publish must not fetch a second one
+                    try:
+                        ttl = max(int(self._exp - time.time()), 1)
+                        await r.set(TOKEN_KEY, json.dumps({"access_token": token, "exp": self._exp}), ex=ttl)
+                    except RedisError as e:
+                        mark_down(e)
+                    return token
+                finally:
+                    await self._unlock(r, owner)
+            deadline = time.monotonic() + budget
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                if await self._load_shared():
+                    return self._token
+                # the holder gave up without publishing: fetch our own
+                if not await r.exists(LOCK_KEY):
+                    break
+        except RedisError as e:
+            mark_down(e)
+        return None
+
+    @staticmethod
+    async def _unlock(r, owner: str):
+        try:
+            await r.eval(_UNLOCK_LUA, 1, LOCK_KEY, owner)
+        except RedisError as e:
+            mark_down(e)
+
+    async def _refresh_loop(self):
+        while True:
+            delay = max(self._exp - self._margin - time.time(), 1) if self._token else 0
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Amadeus token refresh failed: %s", e)
+                await asyncio.sleep(5)
+
+    def start(self):
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher is not None:
+            task, self._refresher = self._refresher, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "valid": self._valid(skew=0),
+            "expiresIn": max(int(self._exp - time.time()), 0) if self._token else 0,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "sharedHits": self.shared_hits,
+            "shared": self._shared,
+        }
@@ -1,19 +1,210 @@
+import base64
+from datetime import date, datetime
+from typing import List, Literal, Optional
+import orjson
+from sqlalchemy import delete, func, insert, text, tuple_
+from sqlalchemy.orm import defer
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.metrics import timed
 from app.db.models import TripModel
+from app.schemas import SaveTripRequest, TripListFilters, TripSort
+
+TotalMode = Literal["exact", "estimate", "none"]
+
+SUMMARY_FIELDS = ("origin", "destination", "depart_date", "return_date", "stops", "price_amount", "currency", "carrier")
+
+# sort key -> (column, ascending). Non-created sorts skip trips without a summary.
+SORTS = {
+    "-created": (TripModel.created_at, False),
+    "price": (TripModel.price_amount, True),
+    "depart": (TripModel.depart_date, True),
+}
+
+def _segments_raw(it: dict) -> list[tuple]:
+    return [
+        ((s.get("departure") or {}).get("iataCode"), (s.get("arrival") or {}).get("iataCode"),
+         (s.get("departure") or {}).get("at"), s.get("carrierCode"))
+        for s in (it or {}).get("segments") or ()
+    ]
+
+def _segments_card(leg: dict) -> list[tuple]:
+    return [
+        ((s.get("from") or {}).get("iata"), (s.get("to") or {}).get("iata"), s.get("depart"), s.get("carrierCode"))
+        for s in (leg or {}).get("segments") or ()
+    ]
+
+def _day(at: Optional[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(at[:10]) if at else None
+    except ValueError:
+        return None
+
+def extract_summary(data) -> dict:
+    """Card summary columns from a saved offer (raw Amadeus offer or normalized card)."""
+    summary = dict.fromkeys(SUMMARY_FIELDS)
+    if not isinstance(data, dict):
+        return summary
+    if "itineraries" in data:
+        legs = [_segments_raw(it) for it in data.get("itineraries") or ()]
+        price = data.get("price") or {}
+        amount = price.get("grandTotal") or price.get("total")
+        airlines = data.get("validatingAirlineCodes")
+    else:
+        legs = [_segments_card(data.get("outbound")), _segments_card(data.get("inbound"))]
+        price = data.get("price") or {}
+        amount = price.get("amount")
+        airlines = data.get("validatingAirlines")
+    out = legs[0] if legs else []
+    back = legs[1] if len(legs) > 1 else []
+    if out:
+        summary.update(
+            origin=out[0][0], destination=out[-1][1], depart_date=_day(out[0][2]),
+            stops=len(out) - 1, carrier=(airlines or [None])[0] or out[0][3],
+        )
+    if back:
+        summary["return_date"] = _day(back[0][2])
+    try:
+        summary["price_amount"] = float(amount) if amount is not None else None
+    except (TypeError, ValueError):
+        pass
+    summary["currency"] = price.get("currency")
+    return summary
+
+def encode_cursor(trip: TripModel, sort: TripSort = "-created") -> str:
+    value = getattr(trip, SORTS[sort][0].key)
+    raw = orjson.dumps([sort, value.isoformat() if isinstance(value, (date, datetime)) else value, trip.id])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: TripSort = "-created") -> tuple:
+    try:
+        kind, value, trip_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if kind != sort:
+            raise ValueError
+        if sort == "-created":
+            value = datetime.fromisoformat(value)
+        elif sort == "depart":
+            value = date.fromisoformat(value)
+        return value, int(trip_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def _filtered(stmt, f: Optional[TripListFilters]):
+    if f is None:
+        return stmt
+    if f.origin:
+        stmt = stmt.where(TripModel.origin == f.origin.upper())
+    if f.destination:
+        stmt = stmt.where(TripModel.destination == f.destination.upper())
+    if f.departFrom:
+        stmt = stmt.where(TripModel.depart_date >= f.departFrom)
+    if f.departTo:
+        stmt = stmt.where(TripModel.depart_date <= f.departTo)
+    if f.maxPrice is not None:
+        stmt = stmt.where(TripModel.price_amount <= f.maxPrice)
+    if f.maxStops is not None:
+        stmt = stmt.where(TripModel.stops <= f.maxStops)
+    if f.carrier:
+        stmt = stmt.where(TripModel.carrier == f.carrier.upper())
+    return stmt
+
+def _has_filters(f: Optional[TripListFilters]) -> bool:
+    return f is not None and any(v is not None for v in f.model_dump().values())
+
+def _sorted_rows(stmt, sort: TripSort):
+    # rows the sort can page through; the count must apply the same predicate
+    if sort != "-created":
+        stmt = stmt.where(SORTS[sort][0].is_not(None))
+    return stmt
+
+def _list_stmt(page: int, page_size: int, cursor: Optional[str], filters: Optional[TripListFilters], sort: TripSort):
+    col, asc = SORTS[sort]
+    stmt = _sorted_rows(_filtered(select(TripModel).options(defer(TripModel.data)), filters), sort)
+    stmt = stmt.order_by(col.asc(), TripModel.id.asc()) if asc else stmt.order_by(col.desc(), TripModel.id.desc())
+    if cursor:
+        key = tuple_(col, TripModel.id)
+        bound = decode_cursor(cursor, sort)
+        stmt = stmt.where(key > bound if asc else key < bound)
+    else:
+        stmt = stmt.offset((page-1)*page_size)
+    # one extra row tells us whether there is a next page
+    return stmt.limit(page_size + 1)
+
+def _page(rows, page_size: int, sort: TripSort):
+    next_cursor = encode_cursor(rows[page_size - 1], sort) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+def _estimate_stmt(mode: TotalMode, filters: Optional[TripListFilters], sort: TripSort, dialect: str):
+    if mode == "estimate" and not _has_filters(filters) and sort == "-created" and dialect == "postgresql":
+        # planner statistics: O(1), refreshed by autovacuum/ANALYZE
+        return text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t").bindparams(t=TripModel.__tablename__)
+    return None
+
+def _count_stmt(filters: Optional[TripListFilters], sort: TripSort = "-created"):
+    return _sorted_rows(_filtered(select(func.count()).select_from(TripModel), filters), sort)
+
+# Bulk writes: one executemany INSERT ... RETURNING (SQLAlchemy packs it into multi-row
+# VALUES batches where the driver allows) and DELETE ... RETURNING over id chunks.
+DELETE_CHUNK = 1000
+
+def _bulk_rows(items: list[SaveTripRequest]) -> list[dict]:
+    now = datetime.utcnow()
+    return [
+        {"offer_id": t.offerId, "data": t.offer, "note": t.note, "created_at": now, **extract_summary(t.offer)}
+        for t in items
+    ]
+
+def _insert_stmt():
+    # RETURNING rows come back in parameter order, so results line up with the request
+    return insert(TripModel).returning(TripModel.id, TripModel.created_at, sort_by_parameter_order=True)
+
+def _delete_stmts(ids: list[int]):
+    unique = list(dict.fromkeys(ids))
+    for i in range(0, len(unique), DELETE_CHUNK):
+        yield delete(TripModel).where(TripModel.id.in_(unique[i:i + DELETE_CHUNK])).returning(TripModel.id)
 
 class TripsService:
+    @timed("db", "trips.save")
     def save(self, session: Session, offer_id: str, data: dict, note: str | None = None):
-        trip = TripModel(offer_id=offer_id, data=data, note=note)
+        trip = TripModel(offer_id=offer_id, data=data, note=note, **extract_summary(data))
         session.add(trip)
         session.commit()
         session.refresh(trip)
         return trip
 
-    def list(self, session: Session, page: int = 1, page_size: int = 20):
-        stmt = select(TripModel).offset((page-1)*page_size).limit(page_size)
-        rows = session.exec(stmt).all()
+    @timed("db", "trips.save_many")
+    def save_many(self, session: Session, items: List[SaveTripRequest]) -> List[tuple[int, datetime]]:
+        """Insert all trips in one transaction; (id, created_at) per item, in order."""
+        if not items:
+            return []
+        rows = session.exec(_insert_stmt(), params=_bulk_rows(items)).all()
+        session.commit()
         return rows
 
+    @timed("db", "trips.list")
+    def list(self, session: Session, page: int = 1, page_size: int = 20, cursor: Optional[str] = None,
+             filters: Optional[TripListFilters] = None, sort: TripSort = "-created"):
+        """One page of trips without the `data` blob, plus the next cursor.
+
+        With `cursor` the page is found by keyset on (sort column, id), which costs the
+        same at any depth; `page` (OFFSET) is kept for shallow, numbered paging.
+        """
+        rows = session.exec(_list_stmt(page, page_size, cursor, filters, sort)).all()
+        return _page(rows, page_size, sort)
+
+    @timed("db", "trips.count")
+    def count(self, session: Session, mode: TotalMode = "exact", filters: Optional[TripListFilters] = None,
+              sort: TripSort = "-created") -> Optional[int]:
+        if mode == "none":
+            return None
+        est = _estimate_stmt(mode, filters, sort, session.get_bind().dialect.name)
+        if est is not None:
+            value = session.exec(est).scalar()
+            if value is not None and value >= 0:
+                return int(value)
+        return session.exec(_count_stmt(filters, sort)).one()
+
+    @timed("db", "trips.delete")
     def delete(self, session: Session, trip_id: int) -> bool:
         trip = session.get(TripModel, trip_id)
         if not trip:
@@ -22,4 +213,68 @@ class TripsService:
         session.commit()
         return True
 
+    @timed("db", "trips.delete_many")
+    def delete_many(self, session: Session, ids: List[int]) -> set[int]:
+        """Delete in one transaction; returns the ids that existed."""
+        deleted = set()
+        for stmt in _delete_stmts(ids):
+            deleted.update(session.exec(stmt).scalars())
+        session.commit()
+        return deleted
+
+class AsyncTripsService:
+    """TripsService over an AsyncSession (DB_ASYNC=true); same statements, awaited."""
+
+    @timed("db", "trips.save")
+    async def save(self, session: AsyncSession, offer_id: str, data: dict, note: str | None = None):
+        trip = TripModel(offer_id=offer_id, data=data, note=note, **extract_summary(data))
+        session.add(trip)
+        await session.commit()
+        await session.refresh(trip)
+        return trip
+
+    @timed("db", "trips.save_many")
+    async def save_many(self, session: AsyncSession, items: List[SaveTripRequest]) -> List[tuple[int, datetime]]:
+        if not items:
+            return []
+        rows = (await session.exec(_insert_stmt(), params=_bulk_rows(items))).all()
+        await session.commit()
+        return rows
+
+    @timed("db", "trips.list")
+    async def list(self, session: AsyncSession, page: int = 1, page_size: int = 20, cursor: Optional[str] = None,
+                   filters: Optional[TripListFilters] = None, sort: TripSort = "-created"):
+        rows = (await session.exec(_list_stmt(page, page_size, cursor, filters, sort))).all()
+        return _page(rows, page_size, sort)
+
+    @timed("db", "trips.count")
+    async def count(self, session: AsyncSession, mode: TotalMode = "exact", filters: Optional[TripListFilters] = None,
+                    sort: TripSort = "-created") -> Optional[int]:
+        if mode == "none":
+            return None
+        est = _estimate_stmt(mode, filters, sort, session.get_bind().dialect.name)
+        if est is not None:
+            value = (await session.exec(est)).scalar()
+            if value is not None and value >= 0:
+                return int(value)
+        return (await session.exec(_count_stmt(filters, sort))).one()
+
+    @timed("db", "trips.delete")
+    async def delete(self, session: AsyncSession, trip_id: int) -> bool:
+        trip = await session.get(TripModel, trip_id)
+        if not trip:
+            return False
+        await session.delete(trip)
+        await session.commit()
+        return True
+
+    @timed("db", "trips.delete_many")
+    async def delete_many(self, session: AsyncSession, ids: List[int]) -> set[int]:
+        deleted = set()
+        for stmt in _delete_stmts(ids):
+            deleted.update((await session.exec(stmt)).scalars())
+        await session.commit()
+        return deleted
+
 trips_service = TripsService()
+async_trips_service = AsyncTripsService()
@@ -0,0 +1,69 @@
+"""Concurrency scaling of the agent pipeline: sync (threadpool) vs async (event loop).
+
+The classifier and tool agent are replaced by stand-ins that take LATENCY seconds,
+like an LLM round trip, so only the pipeline's own concurrency model is measured.
+
+    python -m benchmarks.agent_concurrency --latency 0.5 --levels 10 100 1000
+"""
+import argparse, asyncio, os, time
+
+for k, v in {"AMADEUS_API_KEY": "bench", "AMADEUS_API_SECRET": "bench",
+             "DATABASE_URL": "sqlite://", "OPENAI_API_KEY": "sk-bench"}.items():
+    os.environ.setdefault(k, v)
+
+from langchain_core.runnables import RunnableLambda
+from app.agent import router
+from app.agent.intents import IntentResult
+
+
+def install_stand_ins(latency: float):
+    def classify(_):
+        time.sleep(latency)
+        return IntentResult(intent="FLIGHT_SEARCH", confidence=0.9)
+
+    async def aclassify(_):
+        await asyncio.sleep(latency)
+        return IntentResult(intent="FLIGHT_SEARCH", confidence=0.9)
+
+    def agent(x):
+        time.sleep(latency)
+        return {"output": "ok"}
+
+    async def aagent(x):
+        await asyncio.sleep(latency)
+        return {"output": "ok"}
+
+    router.classifier = RunnableLambda(classify, afunc=aclassify)
+    router.ToolAgent = RunnableLambda(agent, afunc=aagent)
+
+
+async def run_sync(n: int):
+    # What a sync pipeline costs under LangServe: one threadpool thread per request.
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[
+        loop.run_in_executor(None, router.EntryRouter.invoke, "search AMM to DOH") for _ in range(n)
+    ])
+
+
+async def run_async(n: int):
+    await router.EntryRouter.abatch(["search AMM to DOH"] * n, config={"max_concurrency": n})
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.5)
+    ap.add_argument("--levels", type=int, nargs="+", default=[10, 100, 1000])
+    args = ap.parse_args()
+    install_stand_ins(args.latency)
+
+    print(f"{'concurrency':>11} {'mode':>6} {'wall s':>8} {'req/s':>9}")
+    for n in args.levels:
+        for mode, fn in (("sync", run_sync), ("async", run_async)):
+            t0 = time.perf_counter()
+            await fn(n)
+            wall = time.perf_counter() - t0
+            print(f"{n:>11} {mode:>6} {wall:>8.2f} {n / wall:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
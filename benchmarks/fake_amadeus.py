@@ -0,0 +1,112 @@
+"""Local Amadeus stand-in: token, flight-offers search, pricing and flight-orders.
+
+Search answers are synthetic (benchmarks.payloads) or a recorded response, after a
+latency of `--latency` +/- `--jitter` seconds; `--error-429` / `--error-5xx` are the
+share of calls answered with 429 (Retry-After: 1) or 503 instead.
+
+    python -m benchmarks.fake_amadeus --port 8900 --latency 0.2 --error-429 0.02
+"""
+import argparse, asyncio, functools, itertools, random, zlib
+import orjson
+from fastapi import FastAPI, Request, Response
+from benchmarks.payloads import search_response
+
+config = {"latency": 0.2, "jitter": 0.05, "error_429": 0.0, "error_5xx": 0.0, "offers": 50, "payload": None}
+counters = {"search": 0, "price": 0, "order": 0, "429": 0, "5xx": 0}
+_order_ids = itertools.count(1)
+
+app = FastAPI(title="Fake Amadeus")
+
+
+def _json(body, status: int = 200, **headers) -> Response:
+    data = body if isinstance(body, bytes) else orjson.dumps(body)
+    return Response(data, status_code=status, media_type="application/json", headers=headers)
+
+
+async def _upstream() -> Response | None:
+    """Simulated latency, then maybe an injected failure."""
+    await asyncio.sleep(max(0.0, config["latency"] + random.uniform(-config["jitter"], config["jitter"])))
+    roll = random.random()
+    if roll < config["error_429"]:
+        counters["429"] += 1
+        return _json({"errors": [{"status": 429, "title": "Too many requests"}]}, 429, **{"Retry-After": "1"})
+    if roll < config["error_429"] + config["error_5xx"]:
+        counters["5xx"] += 1
+        return _json({"errors": [{"status": 503, "title": "Service unavailable"}]}, 503)
+    return None
+
+
+@functools.lru_cache(maxsize=512)
+def _search_body(origin: str, dest: str, depart: str, ret: str | None, adults: int) -> bytes:
+    if config["payload"]:
+        with open(config["payload"], "rb") as f:
+            return f.read()
+    seed = zlib.crc32(f"{origin}{dest}{depart}{ret}".encode())
+    return orjson.dumps(search_response(config["offers"], seed, origin=origin, dest=dest,
+                                        depart=depart, ret=ret, adults=adults))
+
+
+@app.post("/v1/security/oauth2/token")
+async def token():
+    return {"access_token": "fake-token", "token_type": "Bearer", "expires_in": 1799}
+
+
+@app.get("/v2/shopping/flight-offers")
+async def search(request: Request):
+    counters["search"] += 1
+    q = request.query_params
+    failed = await _upstream()
+    if failed is not None:
+        return failed
+    return _json(_search_body(q.get("originLocationCode", "AMM"), q.get("destinationLocationCode", "DOH"),
+                              q.get("departureDate", "2025-10-10"), q.get("returnDate"), int(q.get("adults", 1))))
+
+
+@app.post("/v1/shopping/flight-offers/pricing")
+async def price(request: Request):
+    counters["price"] += 1
+    body = orjson.loads(await request.body())
+    failed = await _upstream()
+    if failed is not None:
+        return failed
+    return _json({"data": {"type": "flight-offers-pricing", "flightOffers": body["data"]["flightOffers"]}})
+
+
+@app.post("/v1/booking/flight-orders")
+async def order(request: Request):
+    counters["order"] += 1
+    body = orjson.loads(await request.body())
+    failed = await _upstream()
+    if failed is not None:
+        return failed
+    n = next(_order_ids)
+    return _json({"data": {"type": "flight-order", "id": f"FAKE{n:08d}",
+                           "associatedRecords": [{"reference": f"R{n:05d}"}],
+                           "flightOffers": body["data"]["flightOffers"],
+                           "travelers": body["data"].get("travelers", [])}}, 201)
+
+
+@app.get("/stats")
+async def stats():
+    return counters
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency", type=float, default=config["latency"])
+    ap.add_argument("--jitter", type=float, default=config["jitter"])
+    ap.add_argument("--error-429", type=float, default=0.0)
+    ap.add_argument("--error-5xx", type=float, default=0.0)
+    ap.add_argument("--offers", type=int, default=config["offers"], help="offers per synthetic search")
+    ap.add_argument("--payload", help="recorded flight-offers response to serve for every search")
+    args = ap.parse_args()
+    config.update(latency=args.latency, jitter=args.jitter, error_429=args.error_429,
+                  error_5xx=args.error_5xx, offers=args.offers, payload=args.payload)
+
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""A chat model stand-in for the intent classifier and the tool agent.
+
+Answers after a configurable delay with the shapes the app expects from OpenAI:
+a tool call for `with_structured_output(IntentResult)`, a `function_call` to
+`search_offers` for the agent's first turn and a short text answer once the
+function result is in the history. Token usage is reported so /metrics counts it.
+"""
+import asyncio, json, re, time
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, FunctionMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+IATA = re.compile(r"\b[A-Z]{3}\b")
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.3
+    model_name: str = "fake-chat"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], **kwargs: Any) -> ChatResult:
+        human = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        if kwargs.get("tools"):
+            name = kwargs["tools"][0]["function"]["name"]
+            small_talk = human.strip().lower() in {"hi", "hello", "thanks"}
+            args = {"intent": "SMALL_TALK" if small_talk else "FLIGHT_SEARCH", "confidence": 0.9}
+            msg = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call_1"}])
+        elif kwargs.get("functions") and not any(isinstance(m, (FunctionMessage, ToolMessage)) for m in messages):
+            codes = IATA.findall(human) + ["AMM", "DOH"]
+            date = DATE.search(human)
+            args = {"originLocationCode": codes[0], "destinationLocationCode": codes[1],
+                    "departureDate": date.group(0) if date else "2025-10-10"}
+            msg = AIMessage(content="", additional_kwargs={
+                "function_call": {"name": "search_offers", "arguments": json.dumps(args)}})
+        else:
+            msg = AIMessage(content="The cheapest option is listed first. Want me to price it?")
+        prompt = sum(len(str(m.content)) for m in messages) // 4
+        usage = {"prompt_tokens": prompt, "completion_tokens": 20, "total_tokens": prompt + 20}
+        return ChatResult(generations=[ChatGeneration(message=msg)],
+                          llm_output={"token_usage": usage, "model_name": self.model_name})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages, **kwargs)
+
+
+def build_fake_chat_model(latency: float):
+    """Drop-in for app.agent.llm.build_chat_model (same cache/callback defaults)."""
+    from app.config import settings
+    from app.agent.llm_cache import llm_cache
+    from app.metrics import llm_metrics
+
+    def build(**kwargs) -> FakeChatModel:
+        kwargs.pop("model", None)
+        kwargs.pop("temperature", None)
+        kwargs.setdefault("cache", llm_cache if settings.LLM_CACHE_ENABLED else False)
+        kwargs.setdefault("callbacks", [llm_metrics])
+        return FakeChatModel(latency=latency, **kwargs)
+    return build
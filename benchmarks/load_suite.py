@@ -0,0 +1,185 @@
+"""End-to-end load test without Amadeus or OpenAI credentials.
+
+Boots benchmarks.fake_amadeus and the API (benchmarks.serve_app: fake chat model)
+as uvicorn subprocesses, then drives each scenario at each concurrency level and
+reports throughput, p50/p95/p99 latency, errors and the API process's memory.
+
+    python -m benchmarks.load_suite
+    python -m benchmarks.load_suite --scenarios search agent --levels 10 100 --requests 1000 \\
+        --amadeus-latency 0.3 --error-429 0.02 --llm-latency 0.5 --env RATE_LIMIT_RPS=200 --json run.json
+
+Scenarios: search (/amadeus/search over --routes x --dates), price (/amadeus/price by
+offer reference), trips (/trips/list + /trips/save), agent (/agent/invoke).
+"""
+import argparse, asyncio, itertools, json, os, socket, statistics, subprocess, sys, tempfile, time
+from datetime import date, timedelta
+import httpx
+from benchmarks.payloads import AIRPORTS
+
+SCENARIOS = ("search", "price", "trips", "agent")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory_mb(pid: int) -> dict:
+    """Resident and peak resident set of `pid` (Linux /proc; empty elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {k: int(fields[f].split()[0]) / 1024 for k, f in (("rss", "VmRSS"), ("peak", "VmHWM")) if f in fields}
+
+
+async def wait_ready(url: str, proc: subprocess.Popen):
+    async with httpx.AsyncClient() as client:
+        for _ in range(300):
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited during startup")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not start")
+
+
+def routes(n: int) -> list[tuple[str, str]]:
+    return list(itertools.islice(((a, b) for a in AIRPORTS for b in AIRPORTS if a != b), n))
+
+
+class Scenarios:
+    """One request per call; `setup` runs once before the levels."""
+
+    def __init__(self, client: httpx.AsyncClient, n_routes: int, n_dates: int):
+        self.client = client
+        self.routes = routes(n_routes)
+        start = date.today() + timedelta(days=30)
+        self.dates = [(start + timedelta(days=d)).isoformat() for d in range(n_dates)]
+        self.refs: list[dict] = []
+
+    def _search_body(self, i: int) -> dict:
+        origin, dest = self.routes[i % len(self.routes)]
+        return {"originLocationCode": origin, "destinationLocationCode": dest,
+                "departureDate": self.dates[(i // len(self.routes)) % len(self.dates)], "max": 20}
+
+    async def setup(self, name: str):
+        if name == "price" and not self.refs:
+            r = await self.client.post("/amadeus/search", params={"raw": "ref"}, json=self._search_body(0))
+            r.raise_for_status()
+            self.refs = [o["raw"] for o in r.json()["offers"] if o.get("raw")]
+            if not self.refs:
+                raise RuntimeError("search returned no offer references to price")
+
+    async def search(self, i: int) -> httpx.Response:
+        return await self.client.post("/amadeus/search", params={"raw": "ref"}, json=self._search_body(i))
+
+    async def price(self, i: int) -> httpx.Response:
+        return await self.client.post("/amadeus/price", json=self.refs[i % len(self.refs)])
+
+    async def trips(self, i: int) -> httpx.Response:
+        if i % 10 == 0:
+            return await self.client.post("/trips/save", json={
+                "offerId": f"load-{i}", "offer": {"price": {"amount": "99", "currency": "USD"}}})
+        return await self.client.get("/trips/list", params={"pageSize": 20, "total": "none"})
+
+    async def agent(self, i: int) -> httpx.Response:
+        body = self._search_body(i)
+        text = f"Find flights {body['originLocationCode']} to {body['destinationLocationCode']} on {body['departureDate']}"
+        return await self.client.post("/agent/invoke", json={"input": text})
+
+
+async def drive(call, concurrency: int, total: int) -> dict:
+    latencies, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                failed = (await call(i)).status_code >= 400
+            except httpx.TransportError:
+                failed = True
+            latencies.append(time.perf_counter() - t0)
+            errors += failed
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    wall = time.perf_counter() - t0
+    q = statistics.quantiles(latencies, n=100)
+    return {"rps": total / wall, "p50": q[49] * 1000, "p95": q[94] * 1000, "p99": q[98] * 1000, "errors": errors}
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    ap.add_argument("--levels", type=int, nargs="+", default=[10, 50])
+    ap.add_argument("--requests", type=int, default=500, help="requests per scenario and level")
+    ap.add_argument("--routes", type=int, default=10, help="distinct routes searched")
+    ap.add_argument("--dates", type=int, default=30, help="distinct departure dates per route")
+    ap.add_argument("--amadeus-latency", type=float, default=0.2)
+    ap.add_argument("--amadeus-jitter", type=float, default=0.05)
+    ap.add_argument("--error-429", type=float, default=0.0, help="share of Amadeus calls answered 429")
+    ap.add_argument("--error-5xx", type=float, default=0.0, help="share of Amadeus calls answered 503")
+    ap.add_argument("--offers", type=int, default=50, help="offers per fake search response")
+    ap.add_argument("--payload", help="recorded flight-offers response for the fake Amadeus")
+    ap.add_argument("--llm-latency", type=float, default=0.3)
+    ap.add_argument("--db", default=None, help="DATABASE_URL (default: a fresh SQLite file)")
+    ap.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="extra settings for the API")
+    ap.add_argument("--json", help="also write the results here")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="flightai-bench-")
+    amadeus_port, api_port = free_port(), free_port()
+    fake_cmd = [sys.executable, "-m", "benchmarks.fake_amadeus", "--port", str(amadeus_port),
+                "--latency", str(args.amadeus_latency), "--jitter", str(args.amadeus_jitter),
+                "--error-429", str(args.error_429), "--error-5xx", str(args.error_5xx), "--offers", str(args.offers)]
+    if args.payload:
+        fake_cmd += ["--payload", args.payload]
+    env = {**os.environ, "AMADEUS_API_KEY": "bench", "AMADEUS_API_SECRET": "bench", "OPENAI_API_KEY": "sk-bench",
+           "AMADEUS_BASE_URL": f"http://127.0.0.1:{amadeus_port}", "AMADEUS_HTTP2": "false", "REDIS_URL": "",
+           "DATABASE_URL": args.db or f"sqlite:///{tmp}/bench.sqlite",
+           "LLM_CACHE_SQLITE_PATH": f"{tmp}/llm_cache.sqlite",
+           **dict(kv.split("=", 1) for kv in args.env)}
+    fake = subprocess.Popen(fake_cmd, stdout=subprocess.DEVNULL)
+    api = subprocess.Popen([sys.executable, "-m", "benchmarks.serve_app", "--port", str(api_port),
+                            "--llm-latency", str(args.llm_latency)], env=env, stdout=subprocess.DEVNULL)
+    results = []
+    try:
+        await wait_ready(f"http://127.0.0.1:{amadeus_port}/stats", fake)
+        await wait_ready(f"http://127.0.0.1:{api_port}/health", api)
+        limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", limits=limits, timeout=120) as client:
+            scenarios = Scenarios(client, args.routes, args.dates)
+            print(f"{'scenario':>8} {'concurrency':>11} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                  f"{'errors':>6} {'rss MB':>7}")
+            for name in args.scenarios:
+                await scenarios.setup(name)
+                call = getattr(scenarios, name)
+                for n in args.levels:
+                    r = await drive(call, n, args.requests)
+                    r.update(scenario=name, concurrency=n, rss_mb=memory_mb(api.pid).get("rss"))
+                    results.append(r)
+                    print(f"{name:>8} {n:>11} {r['rps']:>9.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+                          f"{r['errors']:>6} {r['rss_mb'] or 0:>7.1f}")
+            upstream = (await client.get(f"http://127.0.0.1:{amadeus_port}/stats")).json()
+        mem = memory_mb(api.pid)
+        print(f"API peak RSS {mem.get('peak', 0):.1f} MB; fake Amadeus calls {upstream}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"args": vars(args), "results": results, "peakRssMb": mem.get("peak"),
+                           "upstream": upstream}, f, indent=2)
+    finally:
+        for proc in (api, fake):
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Offer normalization throughput: the previous pydantic path vs the dict builder.
+
+    python -m benchmarks.normalize_bench --offers 250 --rounds 20
+    python -m benchmarks.normalize_bench --payload recorded_search.json
+"""
+import argparse, json, os, time
+
+for k, v in {"AMADEUS_API_KEY": "bench", "AMADEUS_API_SECRET": "bench",
+             "DATABASE_URL": "sqlite://", "OPENAI_API_KEY": "sk-bench"}.items():
+    os.environ.setdefault(k, v)
+
+import orjson
+from app.schemas import FlightSummary, Money, Leg, Segment
+from app.services.flights_service import normalize_offer
+from benchmarks.payloads import search_response
+
+
+def legacy_normalize(item: dict) -> FlightSummary:
+    # The pre-optimization implementation, kept verbatim as the baseline.
+    itineraries = item.get("itineraries", [])
+    def leg(i):
+        if i >= len(itineraries):
+            return None
+        it = itineraries[i]
+        segs = it.get("segments", [])
+        segments = []
+        for s in segs:
+            segments.append(Segment(
+                carrierCode=s.get("carrierCode"),
+                flightNumber=s.get("number"),
+                **{
+                    "from": {"iata": s.get("departure", {}).get("iataCode"), "terminal": s.get("departure", {}).get("terminal")},
+                    "to": {"iata": s.get("arrival", {}).get("iataCode"), "terminal": s.get("arrival", {}).get("terminal")},
+                },
+                depart=s.get("departure", {}).get("at"),
+                arrive=s.get("arrival", {}).get("at"),
+                aircraft=(s.get("aircraft") or {}).get("code"),
+                cabin=(s.get("co2Emissions") or [{}])[0].get("cabin", None)
+            ))
+        return Leg(
+            depart=segs[0].get("departure", {}).get("at") if segs else None,
+            arrive=segs[-1].get("arrival", {}).get("at") if segs else None,
+            duration=it.get("duration"),
+            stops=max(len(segs)-1, 0),
+            segments=segments
+        )
+    total = item.get("price", {}).get("total", "0.00")
+    currency = item.get("price", {}).get("currency", "USD")
+    adults = item.get("travelerPricings", [{}])
+    n_adults = sum(1 for t in adults if t.get("travelerType") == "ADULT") or 1
+    price_per_adult = f"{float(total)/max(n_adults,1):.2f}"
+    return FlightSummary(
+        id=item.get("id", ""),
+        route={"from": item.get("source", None), "to": None},
+        outbound=leg(0),
+        inbound=leg(1),
+        price=Money(amount=str(total), currency=currency),
+        pricePerAdult=Money(amount=str(price_per_adult), currency=currency),
+        validatingAirlines=item.get("validatingAirlineCodes"),
+        baggage=None,
+        raw=item
+    )
+
+
+def legacy(data):
+    return [o.model_dump(by_alias=True) for o in (legacy_normalize(i) for i in data)]
+
+
+def bench(name, fn, data, rounds):
+    fn(data)  # warm up
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        offers = fn(data)
+    elapsed = time.perf_counter() - t0
+    body = orjson.dumps({"offers": offers})
+    print(f"{name:<18} {len(data) * rounds / elapsed:>12,.0f} {len(body) / 1024:>10,.1f}")
+    return offers
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--offers", type=int, default=250)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--payload", help="recorded /v2/shopping/flight-offers response (JSON)")
+    args = ap.parse_args()
+    if args.payload:
+        with open(args.payload) as f:
+            data = json.load(f)["data"]
+    else:
+        data = search_response(args.offers)["data"]
+
+    print(f"{len(data)} offers x {args.rounds} rounds")
+    print(f"{'path':<18} {'offers/sec':>12} {'body KiB':>10}")
+    before = bench("legacy (pydantic)", legacy, data, args.rounds)
+    after = bench("dict raw=full", lambda d: [normalize_offer(i) for i in d], data, args.rounds)
+    bench("dict raw=ref", lambda d: [normalize_offer(i, "ref", "s") for i in d], data, args.rounds)
+    bench("dict raw=none", lambda d: [normalize_offer(i, "none") for i in d], data, args.rounds)
+    assert before == after, "dict normalizer output differs from the pydantic baseline"
+
+
+if __name__ == "__main__":
+    main()
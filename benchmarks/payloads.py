@@ -0,0 +1,80 @@
+"""Synthetic Amadeus Flight Offers payloads with the shape of real sandbox responses."""
+import random
+
+AIRPORTS = ["AMM", "DOH", "DXB", "IST", "CAI", "JED", "RUH", "BEY", "LHR", "CDG", "FRA", "AUH"]
+CARRIERS = ["RJ", "QR", "EK", "TK", "MS", "SV", "EY", "LH", "AF", "BA"]
+
+
+def _segment(rng: random.Random, seg_id: int, a: str, b: str, day: str) -> dict:
+    carrier = rng.choice(CARRIERS)
+    return {
+        "departure": {"iataCode": a, "terminal": str(rng.randint(1, 3)), "at": f"{day}T{rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}:00"},
+        "arrival": {"iataCode": b, "terminal": str(rng.randint(1, 3)), "at": f"{day}T{rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}:00"},
+        "carrierCode": carrier,
+        "number": str(rng.randint(100, 999)),
+        "aircraft": {"code": rng.choice(["320", "321", "32N", "77W", "789", "359"])},
+        "operating": {"carrierCode": carrier},
+        "duration": f"PT{rng.randint(1, 6)}H{rng.choice([0, 15, 30, 45])}M",
+        "id": str(seg_id),
+        "numberOfStops": 0,
+        "blacklistedInEU": False,
+    }
+
+
+def _itinerary(rng: random.Random, seg_ids, origin: str, dest: str, day: str) -> dict:
+    stops = rng.choice([0, 0, 1, 1, 2])
+    via = rng.sample([a for a in AIRPORTS if a not in (origin, dest)], stops)
+    path = [origin, *via, dest]
+    return {
+        "duration": f"PT{rng.randint(2, 20)}H{rng.choice([0, 15, 30, 45])}M",
+        "segments": [_segment(rng, next(seg_ids), a, b, day) for a, b in zip(path, path[1:])],
+    }
+
+
+def flight_offer(rng: random.Random, offer_id: int, origin="AMM", dest="DOH",
+                 depart="2025-10-10", ret: str | None = "2025-10-17", adults: int = 1) -> dict:
+    seg_ids = iter(range(1, 100))
+    itineraries = [_itinerary(rng, seg_ids, origin, dest, depart)]
+    if ret:
+        itineraries.append(_itinerary(rng, seg_ids, dest, origin, ret))
+    total = round(rng.uniform(120, 1500), 2)
+    segments = [s for it in itineraries for s in it["segments"]]
+    return {
+        "type": "flight-offer",
+        "id": str(offer_id),
+        "source": "GDS",
+        "instantTicketingRequired": False,
+        "nonHomogeneous": False,
+        "oneWay": False,
+        "lastTicketingDate": "2025-10-01",
+        "numberOfBookableSeats": rng.randint(1, 9),
+        "itineraries": itineraries,
+        "price": {
+            "currency": "USD", "total": f"{total:.2f}", "base": f"{total * 0.7:.2f}",
+            "fees": [{"amount": "0.00", "type": "SUPPLIER"}, {"amount": "0.00", "type": "TICKETING"}],
+            "grandTotal": f"{total:.2f}",
+        },
+        "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": True},
+        "validatingAirlineCodes": [segments[0]["carrierCode"]],
+        "travelerPricings": [
+            {
+                "travelerId": str(t + 1), "fareOption": "STANDARD", "travelerType": "ADULT",
+                "price": {"currency": "USD", "total": f"{total / adults:.2f}", "base": f"{total * 0.7 / adults:.2f}"},
+                "fareDetailsBySegment": [
+                    {"segmentId": s["id"], "cabin": "ECONOMY", "fareBasis": "OJOWJO", "brandedFare": "ECOLIGHT",
+                     "class": "O", "includedCheckedBags": {"weight": 23, "weightUnit": "KG"}}
+                    for s in segments
+                ],
+            }
+            for t in range(adults)
+        ],
+    }
+
+
+def search_response(n: int = 250, seed: int = 0, **kwargs) -> dict:
+    rng = random.Random(seed)
+    return {
+        "meta": {"count": n, "links": {"self": "https://test.api.amadeus.com/v2/shopping/flight-offers"}},
+        "data": [flight_offer(rng, i + 1, **kwargs) for i in range(n)],
+        "dictionaries": {"locations": {a: {"cityCode": a, "countryCode": "XX"} for a in AIRPORTS}},
+    }
@@ -0,0 +1,74 @@
+"""Check that a prefetch by the leader worker is served by the others without an upstream call.
+
+Two SearchCache instances stand in for two API workers sharing REDIS_URL: the follower
+fills a query and lets it go stale, the leader's prefetch cycle refreshes it, and the
+follower must then serve the leader's fill (same searchId) without calling upstream.
+
+    REDIS_URL=redis://localhost:6379/15 python -m benchmarks.prefetch_check
+"""
+import asyncio, os, sys, uuid
+from datetime import date, timedelta
+
+for k, v in {"AMADEUS_API_KEY": "bench", "AMADEUS_API_SECRET": "bench",
+             "DATABASE_URL": "sqlite://", "OPENAI_API_KEY": "sk-bench"}.items():
+    os.environ.setdefault(k, v)
+
+from app.services import prefetch
+from app.services.redis_client import close_redis, get_redis
+from app.services.search_cache import SearchCache, canonical_params, cache_key
+from benchmarks.payloads import search_response
+
+TTL = 1.0
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, query: dict) -> dict:
+        self.calls += 1
+        return search_response(5)
+
+
+async def main() -> int:
+    r = get_redis()
+    if r is None:
+        sys.exit("REDIS_URL is required: the check is about the shared tier")
+    leader_cache = SearchCache(ttl=TTL, stale_ttl=60, local_max=100)
+    follower_cache = SearchCache(ttl=TTL, stale_ttl=60, local_max=100)
+    leader_upstream, follower_upstream = Upstream(), Upstream()
+
+    # a query no other run has cached
+    day = (date.today() + timedelta(days=200 + uuid.uuid4().int % 100)).isoformat()
+    query = canonical_params({"originLocationCode": "AMM", "destinationLocationCode": "DOH",
+                              "departureDate": day, "adults": 1, "max": 5})
+    await r.delete(cache_key(query), "prefetch:lock")
+
+    first = await follower_cache.get_or_fetch(query, follower_upstream)
+    await asyncio.sleep(TTL + 0.2)
+
+    prefetch.search_cache = leader_cache
+    leader = prefetch.Prefetcher(interval=60, top_n=10, min_hits=0.5, half_life=600,
+                                 calls_per_minute=60, track_max=100)
+    leader._fetch = leader_upstream
+    leader.record(query)
+    cycle = await leader.run_once()
+
+    refreshed = await leader_cache._read(cache_key(query))
+    served = await follower_cache.get_or_fetch(query, follower_upstream)
+    await asyncio.sleep(0.1)  # let a (wrong) background revalidation show up in the counts
+    await r.delete(cache_key(query), "prefetch:lock")
+    await close_redis()
+
+    checks = {
+        "leader refreshed the stale entry": cycle["refreshed"] == 1 and leader_upstream.calls == 1,
+        "follower served the leader's fill": served["searchId"] == refreshed["data"]["searchId"] != first["searchId"],
+        "follower made no upstream call after the prefetch": follower_upstream.calls == 1,
+    }
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,24 @@
+"""Run app.main with the fake chat model from benchmarks.fake_llm instead of OpenAI.
+
+    python -m benchmarks.serve_app --port 8000 --llm-latency 0.3
+"""
+import argparse
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--llm-latency", type=float, default=0.3)
+    args = ap.parse_args()
+
+    # must happen before app.agent.intents / chain import build_chat_model
+    from app.agent import llm
+    from benchmarks.fake_llm import build_fake_chat_model
+    llm.build_chat_model = build_fake_chat_model(args.llm_latency)
+
+    import uvicorn
+    uvicorn.run("app.main:app", host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()